@@ -1,6 +1,6 @@
 # combined_ultrasonic_mpu6050_pi_extended.py
 import RPi.GPIO as GPIO
-import smbus2, math, time, csv, datetime, threading, statistics, psutil, os
+import smbus2, math, time, datetime, threading, statistics, psutil, os, struct
 
 # --- GPIO pins (BCM numbering) ---
 TRIG, ECHO, MOTOR, BUZZER = 23, 24, 18, 25
@@ -11,6 +11,8 @@ ACCEL_XOUT_H = 0x3B
 PWR_MGMT_1 = 0x6B
 ACCEL_SCALE = 16384.0
 DT = 0.01
+ACCEL_SCALE_INV = 1.0 / ACCEL_SCALE   # multiply, don't divide, per sample
+INV_DT = 1.0 / DT
 FREEFALL_G, IMPACT_G = 0.15, 5
 JERK_THRESH_GPS = 80.0
 COOLDOWN_SEC = 2.0
@@ -37,14 +39,32 @@ bus = smbus2.SMBus(1)
 bus.write_byte_data(MPU_ADDR, PWR_MGMT_1, 0)
 
 # --- Log setup ---
-log = open("multithread_full_metrics_log.csv", "w", newline="")
-writer = csv.writer(log)
-writer.writerow([
-    "timestamp", "distance_cm", "motor_state",
-    "a_mag_g", "jerk_gps", "fsm_state",
-    "loop_time_ms", "sample_rate_Hz", "jitter_ms",
-    "cpu_load_%", "mem_usage_MB", "cpu_temp_C"
-])
+# Rows are batched in memory and written with one os.write every
+# LOG_FLUSH_ROWS samples (~1 s at 10 Hz) instead of write+flush per row.
+LOG_FLUSH_ROWS = 10
+log_fd = os.open("multithread_full_metrics_log.csv",
+                 os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+os.write(log_fd, b"timestamp,distance_cm,motor_state,"
+                 b"a_mag_g,jerk_gps,fsm_state,"
+                 b"loop_time_ms,sample_rate_Hz,jitter_ms,"
+                 b"cpu_load_%,mem_usage_MB,cpu_temp_C\n")
+log_buf = bytearray()
+log_rows = 0
+
+def log_row(*fields):
+    # only the ultrasonic thread logs, so no lock
+    global log_rows
+    log_buf.extend((",".join(map(str, fields)) + "\n").encode())
+    log_rows += 1
+    if log_rows >= LOG_FLUSH_ROWS:
+        flush_log()
+
+def flush_log():
+    global log_rows
+    if log_buf:
+        os.write(log_fd, log_buf)
+        log_buf.clear()
+    log_rows = 0
 
 loop_times = []
 
@@ -93,15 +113,15 @@ def measure_distance():
         stop = time.time()
     return (stop - start) * 17150
 
+_i16 = struct.Struct(">h").unpack
+
 def read_accel():
     def rw(r):
-        h = bus.read_byte_data(MPU_ADDR, r)
-        l = bus.read_byte_data(MPU_ADDR, r + 1)
-        v = (h << 8) + l
-        return v - 65536 if v >= 0x8000 else v
-    ax = rw(ACCEL_XOUT_H) / ACCEL_SCALE
-    ay = rw(ACCEL_XOUT_H + 2) / ACCEL_SCALE
-    az = rw(ACCEL_XOUT_H + 4) / ACCEL_SCALE
+        # one 2-byte block read instead of two byte reads
+        return _i16(bytes(bus.read_i2c_block_data(MPU_ADDR, r, 2)))[0]
+    ax = rw(ACCEL_XOUT_H) * ACCEL_SCALE_INV
+    ay = rw(ACCEL_XOUT_H + 2) * ACCEL_SCALE_INV
+    az = rw(ACCEL_XOUT_H + 4) * ACCEL_SCALE_INV
     return ax, ay, az
 
 # -------------------------
@@ -129,12 +149,11 @@ def ultrasonic_thread():
         cpu_temp = get_temp()
 
         ts = datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        writer.writerow([
+        log_row(
             ts, round(dist, 2), motor_state, "", "", "",
             round(loop_time, 2), round(rate, 2), round(jitter, 2),
             round(cpu_load, 2), round(mem_usage, 2), round(cpu_temp, 2)
-        ])
-        log.flush()
+        )
 
         print(f"[DATA] {ts} | {dist:6.2f}cm | loop {loop_time:5.2f}ms | "
               f"CPU {cpu_load:5.1f}% | Temp {cpu_temp:5.1f}°C | Mem {mem_usage:6.1f}MB")
@@ -151,9 +170,9 @@ def mpu_thread():
     while not stop_event.is_set():
         ax, ay, az = read_accel()
         a_mag = math.sqrt(ax**2 + ay**2 + az**2)
-        jx = (ax - prev_ax) / DT
-        jy = (ay - prev_ay) / DT
-        jz = (az - prev_az) / DT
+        jx = (ax - prev_ax) * INV_DT
+        jy = (ay - prev_ay) * INV_DT
+        jz = (az - prev_az) * INV_DT
         jerk = math.sqrt(jx**2 + jy**2 + jz**2)
         prev_ax, prev_ay, prev_az = ax, ay, az
 
@@ -216,5 +235,7 @@ finally:
     GPIO.output(MOTOR, 0)
     GPIO.output(BUZZER, 0)
     GPIO.cleanup()
-    log.close()
+    flush_log()
+    os.fsync(log_fd)
+    os.close(log_fd)
     print("[CLEANUP] GPIO released and log saved.")
@@ -8,8 +8,12 @@ Synaptics SL1680 – three-model benchmark with:
  - OVERLAY: per-object bounding boxes + per-model HUD
 """
 
+import os
 import cv2
 import time
+import queue
+import threading
+import numpy as np
 import argparse
 from pathlib import Path
 
@@ -44,20 +48,57 @@ def read_adc_temp():
 # ---------------------------------------------------------
 
 class SynapModel:
-    def __init__(self, name, model_path, label_path, color):
+    def __init__(self, name, model_path, label_path, color, score_thr=0.05):
         self.name = name
         self.color = color
 
         import json
         with open(label_path, "r") as f:
-            self.labels = json.load(f)["labels"]
+            # tuple: immutable and slightly cheaper to index per detection
+            self.labels = tuple(json.load(f)["labels"])
 
         self.net = Network(model_path)
         self.pre = Preprocessor()
         # Detector(threshold, maxDet, useNMS, iou, isTiny)
-        self.det = Detector(0.05, 200, True, 0.45, False)
+        self.det = Detector(score_thr, 200, True, 0.45, False)
+
+        # Input tensor type as compiled into the .synap (see model_info.txt);
+        # only logged. Frames are already uint8 BGR, and for uint8/int8 models
+        # the 1/255 scale lives in the input quantization, so the Preprocessor
+        # copies raw pixels either way – there is no float path to choose.
+        self.dtype = str(getattr(self.net.inputs[0], "data_type", "")).lower()
+
+        # Model input size; frames are letterboxed once into this buffer so
+        # the Preprocessor doesn't have to decode + resize a full-size JPEG.
+        inp = self.net.inputs[0]
+        shape = list(inp.shape)
+        if "nchw" in str(getattr(inp, "layout", "")).lower():
+            self.in_h, self.in_w = shape[2], shape[3]
+        else:
+            self.in_h, self.in_w = shape[1], shape[2]
+        self._resize_buf = np.empty((self.in_h, self.in_w, 3), np.uint8)
+        self._lb_size = None   # frame (h, w) _letterbox() was last built for
+        self._tmp = f"/tmp/frame_synap_{name}.jpg"
+
+        print(f"[LOAD] {name}: {model_path.name} "
+              f"(input {self.dtype or '?'}, thr={score_thr})")
 
-        print(f"[LOAD] {name}: {model_path.name}")
+    def _letterbox(self, h_frame, w_frame):
+        """
+        Fit a h_frame x w_frame image into the model input keeping its aspect
+        ratio: scale, padding offsets and the scaled-frame buffer, cached
+        until the frame size changes. Padding is the usual YOLO gray (114).
+        """
+        s = min(self.in_w / w_frame, self.in_h / h_frame)
+        nw, nh = max(1, round(w_frame * s)), max(1, round(h_frame * s))
+        self._pad_x = (self.in_w - nw) // 2
+        self._pad_y = (self.in_h - nh) // 2
+        self._scale_inv = 1.0 / s
+        self._scaled = np.empty((nh, nw, 3), np.uint8)
+        self._roi = self._resize_buf[self._pad_y:self._pad_y + nh,
+                                     self._pad_x:self._pad_x + nw]
+        self._resize_buf.fill(114)
+        self._lb_size = (h_frame, w_frame)
 
     def infer(self, frame, debug=False, frame_idx=0, model_tag=""):
         """
@@ -66,10 +107,20 @@ class SynapModel:
         Coords are converted to IMAGE PIXELS (not 0–1).
         """
         h_frame, w_frame = frame.shape[:2]
-
-        # Write frame to disk for the Synap Preprocessor
-        tmp = "/tmp/frame_synap.jpg"
-        cv2.imwrite(tmp, frame)
+        wm, hm = w_frame - 1, h_frame - 1
+        if self._lb_size != (h_frame, w_frame):
+            self._letterbox(h_frame, w_frame)
+        inv, px, py = self._scale_inv, self._pad_x, self._pad_y
+        labels = self.labels
+
+        # Letterbox to model input size (a plain resize would stretch the
+        # frame and skew box shapes), then write the small frame for the
+        # Synap Preprocessor (no second resize on its side)
+        cv2.resize(frame, self._scaled.shape[1::-1], dst=self._scaled,
+                   interpolation=cv2.INTER_AREA)
+        self._roi[...] = self._scaled
+        tmp = self._tmp
+        cv2.imwrite(tmp, self._resize_buf)
 
         # Use ORIGINAL signature that works: inputs (Tensors) + filename
         rect = self.pre.assign(self.net.inputs, tmp)
@@ -93,26 +144,32 @@ class SynapModel:
 
             # --- IMPORTANT PART ---
             # If everything is tiny (<= 1.5), treat as NORMALIZED [0,1]
-            # and scale to image pixels.
+            # and scale to model-input pixels.
             if (
                 0.0 <= x <= 1.5 and
                 0.0 <= y <= 1.5 and
                 0.0 <= w <= 1.5 and
                 0.0 <= h <= 1.5
             ):
-                x *= w_frame
-                w *= w_frame
-                y *= h_frame
-                h *= h_frame
+                x *= self.in_w
+                w *= self.in_w
+                y *= self.in_h
+                h *= self.in_h
+
+            # model-input pixels -> frame pixels: undo padding, then scale
+            x = (x - px) * inv
+            y = (y - py) * inv
+            w *= inv
+            h *= inv
 
             # Convert to ints and clamp to frame bounds
-            x = max(0, min(int(round(x)), w_frame - 1))
-            y = max(0, min(int(round(y)), h_frame - 1))
+            x = max(0, min(int(round(x)), wm))
+            y = max(0, min(int(round(y)), hm))
             w = max(1, min(int(round(w)), w_frame - x))
             h = max(1, min(int(round(h)), h_frame - y))
 
             det = {
-                "label": self.labels[item.class_index],
+                "label": labels[item.class_index],
                 "score": float(conf),
                 "x": x,
                 "y": y,
@@ -236,6 +293,36 @@ def draw_summary_hud(frame, summaries):
         )
 
 
+# ---------------------------------------------------------
+# Latency stats
+# ---------------------------------------------------------
+
+def latency_stats(samples):
+    """
+    Returns (avg, p50, p95, p99) in seconds; zeros when there are no samples.
+    """
+    if not samples:
+        return 0.0, 0.0, 0.0, 0.0
+    arr = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return float(arr.mean()), float(p50), float(p95), float(p99)
+
+
+# ---------------------------------------------------------
+# Async video writer (keeps encode out of the timed loop)
+# ---------------------------------------------------------
+
+def video_writer_loop(out, q):
+    """
+    Drain frames from `q` into the VideoWriter until a None sentinel.
+    """
+    while True:
+        frame = q.get()
+        if frame is None:
+            break
+        out.write(frame)
+
+
 # ---------------------------------------------------------
 # Main benchmark
 # ---------------------------------------------------------
@@ -246,8 +333,21 @@ def main():
     parser.add_argument("--frames", type=int, default=300)
     parser.add_argument("--save-video", action="store_true")
     parser.add_argument("--dump", type=str, default=None)
+    parser.add_argument("--no-draw", action="store_true",
+                        help="Skip box/HUD drawing (pure NPU throughput)")
+    parser.add_argument("--score-thr", type=float, default=0.05,
+                        help="Detector score threshold (retune for re-quantized models)")
     args = parser.parse_args()
 
+    # Keep OpenCV's worker pool small so it doesn't fight the writer thread
+    # and the NPU driver, and stay on the last (performance) cores.
+    ncpu = os.cpu_count() or 1
+    cv2.setNumThreads(min(4, ncpu))
+    try:
+        os.sched_setaffinity(0, set(range(max(0, ncpu - 4), ncpu)))
+    except Exception:
+        pass
+
     SCRIPT = Path(__file__).resolve()
     ROOT = SCRIPT.parents[2]   # wearable-navigation project root
 
@@ -278,7 +378,8 @@ def main():
 
     for key, cfg in MODELS.items():
         models[key] = {
-            "model": SynapModel(key, cfg["model"], cfg["labels"], cfg["color"]),
+            "model": SynapModel(key, cfg["model"], cfg["labels"], cfg["color"],
+                                score_thr=args.score_thr),
             "color": cfg["color"],
             "tag": cfg["tag"],
         }
@@ -303,8 +404,17 @@ def main():
             (W, H),
         )
         print("Will save output as synap_benchmark_output.mp4")
+        writer_q = queue.Queue(maxsize=16)
+        writer_t = threading.Thread(
+            target=video_writer_loop, args=(out, writer_q), daemon=True
+        )
+        writer_t.start()
     else:
         out = None
+    dropped_frames = 0
+
+    # Overlays are only visible in the saved video
+    draw = out is not None and not args.no_draw
 
     per_frame_lat = []
     per_model_lat = {k: [] for k in models.keys()}
@@ -339,16 +449,17 @@ def main():
             per_model_lat[key].append(t2 - t1)
 
             # draw all boxes for this model
-            draw_boxes(frame, dets, pack["color"], pack["tag"])
+            if draw:
+                draw_boxes(frame, dets, pack["color"], pack["tag"])
 
-            if dets:
+            if draw and dets:
                 best = max(dets, key=lambda d: d["score"])
                 hud_summaries.append(
                     (pack["tag"], best["label"], best["score"], pack["color"])
                 )
 
         # draw top-left HUD
-        if hud_summaries:
+        if draw and hud_summaries:
             draw_summary_hud(frame, hud_summaries)
 
         t_frame_end = time.time()
@@ -358,7 +469,12 @@ def main():
         adc_temp_log.append(read_adc_temp())
 
         if out:
-            out.write(frame)
+            # cap.read() hands back a fresh array each time, no copy needed.
+            # If the encoder falls behind, drop the frame instead of stalling.
+            try:
+                writer_q.put_nowait(frame)
+            except queue.Full:
+                dropped_frames += 1
 
         if frame_idx % 50 == 0:
             print(f"Processed {frame_idx} frames", end="\r")
@@ -367,16 +483,15 @@ def main():
 
     cap.release()
     if out:
+        writer_q.put(None)
+        writer_t.join()
         out.release()
+        if dropped_frames:
+            print(f"\nWriter dropped {dropped_frames} frames")
 
     total_time = time.time() - t0
     fps_final = frame_idx / total_time if frame_idx > 0 else 0.0
-    avg_lat = sum(per_frame_lat) / len(per_frame_lat) if per_frame_lat else 0.0
-    p95_lat = (
-        sorted(per_frame_lat)[int(0.95 * len(per_frame_lat))]
-        if per_frame_lat
-        else 0.0
-    )
+    avg_lat, p50_lat, p95_lat, p99_lat = latency_stats(per_frame_lat)
 
     # ---------------------------------------------------------
     # Dump logs
@@ -396,15 +511,14 @@ def main():
     print(f"Frames processed: {frame_idx}")
     print(f"FPS: {fps_final:.2f}")
     print(f"Avg latency: {avg_lat*1000:.2f} ms")
-    print(f"P95 latency: {p95_lat*1000:.2f} ms\n")
+    print(f"P50 latency: {p50_lat*1000:.2f} ms")
+    print(f"P95 latency: {p95_lat*1000:.2f} ms")
+    print(f"P99 latency: {p99_lat*1000:.2f} ms\n")
 
     print("Per model avg latencies:")
     for key in per_model_lat:
-        if per_model_lat[key]:
-            ms = sum(per_model_lat[key]) / len(per_model_lat[key]) * 1000
-        else:
-            ms = 0.0
-        print(f"{key}: {ms:.2f} ms")
+        avg, _, p95, _ = latency_stats(per_model_lat[key])
+        print(f"{key}: {avg*1000:.2f} ms (p95 {p95*1000:.2f} ms)")
 
     print("\nDone. If video saved: synap_benchmark_output.mp4\n")
 
@@ -1,3 +1,4 @@
+import os
 import time
 import multiprocessing as mp
 from pathlib import Path
@@ -5,6 +6,7 @@ import gpiod
 from gpiod.line import Direction, Value
 from smbus2 import SMBus
 import math
+import struct
 
 # ---------------- GPIO MAP -----------------
 TRIG = 10
@@ -12,6 +14,17 @@ ECHO = 37
 MOTOR = 36
 BUZZER = 39
 
+ACCEL_SCALE_INV = 1.0 / 16384.0   # ±2g LSB/g, as a multiplier
+
+# -------- CPU pinning ----------
+def pin_to_core(core):
+    # keep each sensor process on its own core to avoid GPIO timing jitter
+    try:
+        ncpu = os.cpu_count() or 1
+        os.sched_setaffinity(0, {core % ncpu})
+    except Exception:
+        pass
+
 # -------- libgpiod helpers ----------
 def get_chip_and_line(gpio_id):
     if 0 <= gpio_id < 32:
@@ -57,6 +70,7 @@ class GPIO:
 # PROCESS 1 — Ultrasonic + Motor
 # -----------------------------------------------------------
 def ultrasonic_process(queue, pause_flag):
+    pin_to_core(2)
 
     trig = GPIO(TRIG, Direction.OUTPUT)
     echo = GPIO(ECHO, Direction.INPUT)
@@ -105,6 +119,7 @@ def ultrasonic_process(queue, pause_flag):
 # PROCESS 2 — MPU6050 + Buzzer
 # -----------------------------------------------------------
 def mpu_process(queue, pause_flag):
+    pin_to_core(3)
 
     bus = SMBus(0)
     MPU = 0x68
@@ -115,9 +130,9 @@ def mpu_process(queue, pause_flag):
     prev = (0,0,0)
 
     while True:
-        ax = read_word(bus, 0x3B)/16384.0
-        ay = read_word(bus, 0x3D)/16384.0
-        az = read_word(bus, 0x3F)/16384.0
+        ax = read_word(bus, 0x3B)*ACCEL_SCALE_INV
+        ay = read_word(bus, 0x3D)*ACCEL_SCALE_INV
+        az = read_word(bus, 0x3F)*ACCEL_SCALE_INV
 
         mag = math.sqrt(ax*ax + ay*ay + az*az)
 
@@ -133,11 +148,11 @@ def mpu_process(queue, pause_flag):
 
         time.sleep(0.01)
 
+_i16 = struct.Struct(">h").unpack
+
 def read_word(bus, reg):
-    hi = bus.read_byte_data(0x68, reg)
-    lo = bus.read_byte_data(0x68, reg+1)
-    v = (hi<<8) | lo
-    return v - 65536 if v>=0x8000 else v
+    # one 2-byte block read (auto-increment) instead of two byte reads
+    return _i16(bytes(bus.read_i2c_block_data(0x68, reg, 2)))[0]
 
 # -----------------------------------------------------------
 # PROCESS 3 — MAIN FSM
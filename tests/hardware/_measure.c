@@ -0,0 +1,75 @@
+/*
+ * HC-SR04 pulse timing for the sysfs GPIO path, called from Python via ctypes.
+ *
+ * Build on the board:
+ *     cc -O2 -shared -fPIC -o _measure.so _measure.c
+ *
+ * fd_trig / fd_echo are the already-open /sys/class/gpio/gpioN/value fds.
+ * ECHO must have edge=both configured so poll() reports POLLPRI per edge.
+ */
+
+#include <poll.h>
+#include <time.h>
+#include <unistd.h>
+
+static long long now_ns(void)
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC_RAW, &ts);
+    return (long long)ts.tv_sec * 1000000000LL + ts.tv_nsec;
+}
+
+/* Milliseconds left until deadline, rounded up; 0 once it has passed. */
+static int remaining_ms(long long deadline)
+{
+    long long left = deadline - now_ns();
+
+    return left <= 0 ? 0 : (int)((left + 999999) / 1000000);
+}
+
+/* Wait for the next edge on fd; returns the level after it ('0'/'1') or -1. */
+static int wait_edge(int fd, int timeout_ms)
+{
+    struct pollfd pfd = { .fd = fd, .events = POLLPRI | POLLERR };
+    char c;
+
+    if (poll(&pfd, 1, timeout_ms) <= 0)
+        return -1;
+    if (pread(fd, &c, 1, 0) != 1)   /* also re-arms the notification */
+        return -1;
+    return c;
+}
+
+/*
+ * Fire a 10 us trigger and time the echo pulse. timeout_ms bounds the whole
+ * echo (both edges) from the trigger, so the caller's worst case is known.
+ * Returns the pulse width in microseconds, or -1.0 on timeout/error.
+ */
+double pulse(int fd_trig, int fd_echo, int timeout_ms)
+{
+    struct pollfd pfd = { .fd = fd_echo, .events = POLLPRI | POLLERR };
+    long long start, end, deadline;
+    char c;
+
+    /* drop any edge left over from the previous ping */
+    if (poll(&pfd, 1, 0) > 0)
+        pread(fd_echo, &c, 1, 0);
+
+    if (pwrite(fd_trig, "1", 1, 0) != 1)
+        return -1.0;
+    end = now_ns() + 10000;
+    while (now_ns() < end)
+        ;
+    if (pwrite(fd_trig, "0", 1, 0) != 1)
+        return -1.0;
+    deadline = now_ns() + timeout_ms * 1000000LL;
+
+    if (wait_edge(fd_echo, remaining_ms(deadline)) != '1')
+        return -1.0;
+    start = now_ns();
+    if (wait_edge(fd_echo, remaining_ms(deadline)) < 0)
+        return -1.0;
+    end = now_ns();
+
+    return (end - start) / 1000.0;
+}
@@ -1,9 +1,10 @@
 #dless Roboflow inference on Synaptics Astra AI (GStreamer NV12 appsink)
 # - Camera: /dev/video6 (NV12)
 # - No GUI (console-only)
-# - Uses Roboflow inference SDK with temp-file JPEG uploads for compatibility
+# - Uses Roboflow inference SDK with in-memory frames (falls back to one reused JPEG in /dev/shm)
 
-import os, time, cv2, tempfile, collections, signal, sys
+import os, time, cv2, collections, signal, sys
+import numpy as np
 from inference_sdk import InferenceHTTPClient
 
 # ---------- User settings ----------
@@ -18,6 +19,7 @@ CONF_THRESH = 0.45                # ignore low-confidence boxes
 SMOOTH_WINDOW = 8                 # moving window of top-class
 SMOOTH_MIN_COUNT = 3              # require >= N hits in window
 CLASSES = ("Red", "Yellow", "Green")
+INFER_TMP_PATH = "/dev/shm/infer.jpg"  # only used if the SDK won't take arrays
 # -----------------------------------
 
 API_KEY = os.environ.get("ROBOFLOW_API_KEY")
@@ -46,17 +48,76 @@ def open_cam_gst(device, w, h, fps):
         raise SystemExit("GStreamer camera open failed (check /dev node, caps, OpenCV GStreamer build)")
     return cap
 
+class Resizer:
+    """
+    Downscale frames to a max width into one reused output buffer.
+    The buffer is (re)allocated only when the input frame size changes.
+    """
+    def __init__(self, max_w):
+        self.max_w = max_w
+        self.src_shape = None
+        self.dst = None
+
+    def resize(self, img):
+        h, w = img.shape[:2]
+        if w <= self.max_w:
+            return img
+        if img.shape != self.src_shape:
+            scale = self.max_w / w
+            self.dst = np.empty((int(h*scale), int(w*scale)) + img.shape[2:], dtype=img.dtype)
+            self.src_shape = img.shape
+        cv2.resize(img, (self.dst.shape[1], self.dst.shape[0]), dst=self.dst, interpolation=cv2.INTER_AREA)
+        return self.dst
+
+_shrinkers = {}
+
 def shrink(img, max_w):
-    h, w = img.shape[:2]
-    if w <= max_w:
-        return img
-    scale = max_w / w
-    return cv2.resize(img, (int(w*scale), int(h*scale)), interpolation=cv2.INTER_AREA)
+    r = _shrinkers.get(max_w)
+    if r is None:
+        r = _shrinkers[max_w] = Resizer(max_w)
+    return r.resize(img)
+
+_JPEG_PARAMS = {}
 
 def encode_jpeg(img, quality=80):
-    ok, jpg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    params = _JPEG_PARAMS.get(quality)
+    if params is None:
+        params = _JPEG_PARAMS[quality] = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    ok, jpg = cv2.imencode(".jpg", img, params)
     return jpg.tobytes() if ok else None
 
+# Inference input state: try ndarray first, remember if the SDK rejects it
+_infer_accepts_array = True
+_infer_fd = None
+
+def infer_frame(img):
+    """
+    Run inference on a BGR frame without a per-call temp file.
+    Falls back to rewriting a single pre-opened JPEG in /dev/shm.
+    """
+    global _infer_accepts_array, _infer_fd
+    if _infer_accepts_array:
+        try:
+            return client.infer(img, model_id=MODEL_ID)
+        except (TypeError, NotImplementedError):
+            _infer_accepts_array = False
+
+    jpg_bytes = encode_jpeg(img, JPEG_QUALITY)
+    if jpg_bytes is None:
+        return None
+    if _infer_fd is None:
+        _infer_fd = os.open(INFER_TMP_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.pwrite(_infer_fd, jpg_bytes, 0)
+    os.ftruncate(_infer_fd, len(jpg_bytes))
+    return client.infer(INFER_TMP_PATH, model_id=MODEL_ID)
+
+def close_infer_file():
+    global _infer_fd
+    if _infer_fd is not None:
+        try: os.close(_infer_fd)
+        except: pass
+        _infer_fd = None
+
 def smooth_state(history, classes, min_count):
     counts = {k: 0 for k in classes}
     for v in history:
@@ -106,19 +167,10 @@ def main():
             # rate-limit inferences
             preds = []
             if (now - last_infer_time) >= min_infer_interval:
-                jpg_bytes = encode_jpeg(send_frame, JPEG_QUALITY)
-                if jpg_bytes is None:
+                res = infer_frame(send_frame)
+                if res is None:
                     continue
 
-                # temp-file path for max compatibility with SDK
-                tmp = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
-                try:
-                    tmp.write(jpg_bytes); tmp.flush(); tmp.close()
-                    res = client.infer(tmp.name, model_id=MODEL_ID)
-                finally:
-                    try: os.unlink(tmp.name)
-                    except: pass
-
                 preds = [p for p in res.get("predictions", []) if p.get("confidence", 0.0) >= CONF_THRESH]
                 last_infer_time = now
 
@@ -150,6 +202,7 @@ def main():
     finally:
         try: cap.release()
         except: pass
+        close_infer_file()
         print("\n[INFO] Stopped.")
 
 # Graceful SIGTERM for service mode
@@ -19,17 +19,14 @@ All GPIO exports are:
 """
 
 import os
-import errno
 import time
 import threading
 import signal
 import sys
 
-# ===================== GPIO CONFIG =====================
+from gpio_sysfs import gpio_path, export_gpio, unexport_gpio, set_direction, write_value
 
-GPIO_BASE_PATH = "/sys/class/gpio"
-EXPORT_PATH    = os.path.join(GPIO_BASE_PATH, "export")
-UNEXPORT_PATH  = os.path.join(GPIO_BASE_PATH, "unexport")
+# ===================== GPIO CONFIG =====================
 
 # Edit these to match your wiring
 BUZZER_PIN       = 426
@@ -38,94 +35,15 @@ RIGHT_HAPTIC_PIN = 485
 
 ALL_PINS = [BUZZER_PIN, LEFT_HAPTIC_PIN, RIGHT_HAPTIC_PIN]
 
-# Global stop flag
-running = True
+# Global stop flag; set() wakes any thread sleeping on it
+stop_event = threading.Event()
 
-# Simple lock to avoid concurrent writes to same sysfs file
-gpio_lock = threading.Lock()
+# No GPIO lock: each pin has its own persistent value fd and a one-byte
+# pwrite() is atomic, so the threads write their pins independently.
 
 
 # ===================== GPIO HELPERS =====================
 
-def gpio_path(pin: int, name: str = "") -> str:
-    base = os.path.join(GPIO_BASE_PATH, f"gpio{pin}")
-    return base if not name else os.path.join(base, name)
-
-
-def export_gpio(pin: int):
-    """
-    Idempotent export:
-    - If gpioX already exists: skip
-    - If export gives EBUSY: treat as 'already exported'
-    """
-    path = gpio_path(pin)
-    if os.path.exists(path):
-        print(f"[GPIO INIT] GPIO {pin} already exported, skipping.")
-        return
-
-    try:
-        with open(EXPORT_PATH, "w") as f:
-            f.write(str(pin))
-        print(f"[GPIO INIT] GPIO {pin} exported successfully.")
-    except OSError as e:
-        if e.errno == errno.EBUSY:
-            print(f"[GPIO INIT] GPIO {pin} export EBUSY (already in use?), continuing.")
-        else:
-            print(f"[GPIO ERROR] Failed to export GPIO {pin}: {e}")
-            raise
-
-
-def unexport_gpio(pin: int):
-    """
-    Safe unexport:
-    - If gpioX doesn't exist: skip
-    - Ignore EINVAL (not exported) errors
-    """
-    path = gpio_path(pin)
-    if not os.path.exists(path):
-        # nothing to do
-        return
-
-    try:
-        with open(UNEXPORT_PATH, "w") as f:
-            f.write(str(pin))
-        print(f"[CLEANUP] Unexported GPIO {pin}")
-    except OSError as e:
-        # Some kernels throw EINVAL if pin is not exported
-        if e.errno in (errno.EINVAL, errno.ENOENT):
-            print(f"[CLEANUP] GPIO {pin} not exported (EINVAL/ENOENT), skipping.")
-        else:
-            print(f"[CLEANUP ERROR] Failed to unexport GPIO {pin}: {e}")
-
-
-def set_gpio_direction(pin: int, direction: str):
-    """
-    direction: "in" or "out"
-    """
-    dir_path = gpio_path(pin, "direction")
-    try:
-        with open(dir_path, "w") as f:
-            f.write(direction)
-        print(f"[GPIO INIT] GPIO {pin} direction set to {direction}")
-    except OSError as e:
-        print(f"[GPIO ERROR] Failed to set direction on GPIO {pin}: {e}")
-        # Decide if you want to raise here; for demo we just log.
-
-
-def write_gpio_value(pin: int, value: int):
-    """
-    value: 0 or 1
-    Thread-safe write.
-    """
-    val_path = gpio_path(pin, "value")
-    try:
-        with gpio_lock:
-            with open(val_path, "w") as f:
-                f.write("1" if value else "0")
-    except OSError as e:
-        print(f"[GPIO ERROR] Failed to write value to GPIO {pin}: {e}")
-
-
 def init_gpio_pins():
     """
     Full init:
@@ -145,8 +63,8 @@ def init_gpio_pins():
     # Export and configure
     for pin in ALL_PINS:
         export_gpio(pin)
-        set_gpio_direction(pin, "out")
-        write_gpio_value(pin, 0)
+        set_direction(pin, "out")
+        write_value(pin, 0)
 
     print("[SYSTEM] GPIO init complete.")
 
@@ -158,7 +76,7 @@ def cleanup_all():
     print("[SYSTEM] Cleanup starting...")
 
     for pin in ALL_PINS:
-        write_gpio_value(pin, 0)
+        write_value(pin, 0)
         unexport_gpio(pin)
 
     print("[SYSTEM] Cleanup done.")
@@ -172,13 +90,14 @@ def heartbeat_thread():
     """
     print("[THREAD] Heartbeat thread started.")
     state = 0
-    while running:
+    while not stop_event.is_set():
         state ^= 1
-        write_gpio_value(BUZZER_PIN, state)
-        time.sleep(1.0)
+        write_value(BUZZER_PIN, state)
+        if stop_event.wait(1.0):
+            break
 
     # Ensure off on exit
-    write_gpio_value(BUZZER_PIN, 0)
+    write_value(BUZZER_PIN, 0)
     print("[THREAD] Heartbeat thread exiting.")
 
 
@@ -188,18 +107,16 @@ def left_haptic_thread():
     Replace with your real navigation logic.
     """
     print("[THREAD] Left haptic thread started.")
-    while running:
+    while not stop_event.is_set():
         # simulate a short haptic pulse
-        write_gpio_value(LEFT_HAPTIC_PIN, 1)
+        write_value(LEFT_HAPTIC_PIN, 1)
         time.sleep(0.2)
-        write_gpio_value(LEFT_HAPTIC_PIN, 0)
-        # rest
-        for _ in range(30):
-            if not running:
-                break
-            time.sleep(0.1)
-
-    write_gpio_value(LEFT_HAPTIC_PIN, 0)
+        write_value(LEFT_HAPTIC_PIN, 0)
+        # rest (returns early on shutdown)
+        if stop_event.wait(3.0):
+            break
+
+    write_value(LEFT_HAPTIC_PIN, 0)
     print("[THREAD] Left haptic thread exiting.")
 
 
@@ -209,33 +126,28 @@ def right_haptic_thread():
     Replace with your real navigation logic.
     """
     print("[THREAD] Right haptic thread started.")
-    while running:
-        write_gpio_value(RIGHT_HAPTIC_PIN, 1)
+    while not stop_event.is_set():
+        write_value(RIGHT_HAPTIC_PIN, 1)
         time.sleep(0.2)
-        write_gpio_value(RIGHT_HAPTIC_PIN, 0)
-        # rest
-        for _ in range(50):
-            if not running:
-                break
-            time.sleep(0.1)
-
-    write_gpio_value(RIGHT_HAPTIC_PIN, 0)
+        write_value(RIGHT_HAPTIC_PIN, 0)
+        # rest (returns early on shutdown)
+        if stop_event.wait(5.0):
+            break
+
+    write_value(RIGHT_HAPTIC_PIN, 0)
     print("[THREAD] Right haptic thread exiting.")
 
 
 # ===================== SIGNAL HANDLING =====================
 
 def signal_handler(signum, frame):
-    global running
     print(f"\n[SIGNAL] Caught signal {signum}, shutting down...")
-    running = False
+    stop_event.set()
 
 
 # ===================== MAIN =====================
 
 def main():
-    global running
-
     print("[SYSTEM] Starting Wearable Navigation System (demo multithread)...")
 
     # Register Ctrl+C handler
@@ -254,14 +166,13 @@ def main():
     for t in threads:
         t.start()
 
-    # Main loop just waits until running == False
+    # Main thread sleeps until the signal handler sets stop_event
     try:
-        while running:
-            time.sleep(0.5)
+        stop_event.wait()
     finally:
         # Join threads
         print("[SYSTEM] Joining threads...")
-        running = False
+        stop_event.set()
         for t in threads:
             t.join(timeout=1.0)
 
@@ -278,6 +189,6 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         # Redundant, but safe
         print("\n[MAIN] KeyboardInterrupt - exiting.")
-        running = False
+        stop_event.set()
         cleanup_all()
         sys.exit(0)
@@ -0,0 +1,111 @@
+"""
+Thin libgpiod (v2 API) wrapper for the HC-SR04 pins on Astra SL1680.
+
+Uses the GPIO character device instead of /sys/class/gpio:
+- lines are requested once and held, so a get/set is a single ioctl
+- the echo line is requested with edge detection, so the pulse width comes
+  from kernel-timestamped RISING/FALLING events instead of a Python poll loop
+
+Pins are given as the same global numbers the sysfs scripts use (426, 485, ...)
+and mapped to (/dev/gpiochipN, offset) through /sys/class/gpio/gpiochip*/base.
+"""
+
+import time
+from pathlib import Path
+
+import gpiod
+from gpiod.line import Direction, Edge, Value
+
+SYSFS_GPIO_ROOT = Path("/sys/class/gpio")
+
+
+def resolve_sysfs_pin(pin):
+    """
+    Map a global sysfs GPIO number to (chip device path, line offset).
+    """
+    for chip_dir in SYSFS_GPIO_ROOT.glob("gpiochip*"):
+        base = int((chip_dir / "base").read_text())
+        ngpio = int((chip_dir / "ngpio").read_text())
+        if not base <= pin < base + ngpio:
+            continue
+
+        label = (chip_dir / "label").read_text().strip()
+        for dev in sorted(Path("/dev").glob("gpiochip*")):
+            with gpiod.Chip(str(dev)) as chip:
+                if chip.get_info().label == label:
+                    return str(dev), pin - base
+
+    raise ValueError(f"No gpiochip found for GPIO {pin}")
+
+
+class Ultrasonic:
+    """
+    HC-SR04 on two held line requests: TRIG as output, ECHO as input with
+    edge events on both edges.
+    """
+
+    def __init__(self, trig_pin, echo_pin, consumer="wearable-nav"):
+        trig_chip, self.trig_line = resolve_sysfs_pin(trig_pin)
+        echo_chip, self.echo_line = resolve_sysfs_pin(echo_pin)
+
+        self.trig_req = gpiod.request_lines(
+            trig_chip,
+            consumer=consumer,
+            config={
+                self.trig_line: gpiod.LineSettings(
+                    direction=Direction.OUTPUT, output_value=Value.INACTIVE
+                )
+            },
+        )
+        try:
+            self.echo_req = gpiod.request_lines(
+                echo_chip,
+                consumer=consumer,
+                config={
+                    self.echo_line: gpiod.LineSettings(
+                        direction=Direction.INPUT, edge_detection=Edge.BOTH
+                    )
+                },
+            )
+        except Exception:
+            # don't keep TRIG held: the sysfs fallback has to export it
+            self.trig_req.release()
+            raise
+
+    def measure(self, timeout=0.2, settle=0.002):
+        """
+        Fire one ping and return the distance in cm, or None on timeout.
+        """
+        trig, req = self.trig_req, self.echo_req
+
+        # Drop edges left over from a previous (timed-out) ping
+        while req.wait_edge_events(0):
+            req.read_edge_events()
+
+        trig.set_value(self.trig_line, Value.INACTIVE)
+        time.sleep(settle)
+        trig.set_value(self.trig_line, Value.ACTIVE)
+        end = time.monotonic_ns() + 10_000  # 10 us; sleep() would overshoot
+        while time.monotonic_ns() < end:
+            pass
+        trig.set_value(self.trig_line, Value.INACTIVE)
+
+        start = None
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not req.wait_edge_events(remaining):
+                return None
+            for ev in req.read_edge_events():
+                if ev.event_type == ev.Type.RISING_EDGE:
+                    start = ev.timestamp_ns
+                elif start is not None:
+                    # 34300 cm/s round trip -> 17150 cm/s one way
+                    return (ev.timestamp_ns - start) * 17150e-9
+
+    def close(self):
+        for req in (self.trig_req, self.echo_req):
+            try:
+                req.release()
+            except Exception:
+                pass
@@ -0,0 +1,211 @@
+"""
+Shared sysfs GPIO helpers for the Astra SL1680 hardware demos.
+
+- Exports are idempotent and EBUSY-safe
+- gpioN/value stays open per pin: a toggle/sample is one pwrite/pread
+- post_value() hands actuator writes to a single writer thread
+"""
+
+import os
+import time
+import errno
+import queue
+import threading
+
+GPIO_ROOT     = "/sys/class/gpio"
+EXPORT_PATH   = "/sys/class/gpio/export"
+UNEXPORT_PATH = "/sys/class/gpio/unexport"
+
+
+# ----------------- PATH HELPERS -----------------
+def gpio_path(pin):
+    return f"/sys/class/gpio/gpio{pin}"
+
+# Per-pin attribute paths, built once at export time instead of per access
+VALUE_PATH = {}
+DIR_PATH = {}
+
+def cache_paths(pin):
+    base = gpio_path(pin)
+    VALUE_PATH[pin] = base + "/value"
+    DIR_PATH[pin] = base + "/direction"
+
+
+# ----------------- EXPORT / UNEXPORT -----------------
+def export_gpio(pin):
+    """
+    Idempotent + EBUSY-safe export:
+    - If /sys/class/gpio/gpioN exists -> skip
+    - If export returns EBUSY -> treat as 'already exported or reserved'
+      (we then check if gpioN exists; if not, pin is reserved by some driver)
+    """
+    path = gpio_path(pin)
+    cache_paths(pin)
+
+    # Already exported
+    if os.path.exists(path):
+        print(f"[GPIO INIT] GPIO {pin} already exported, skipping.")
+        return path
+
+    try:
+        with open(EXPORT_PATH, "w") as f:
+            f.write(str(pin))
+        # Give sysfs a moment to create the directory
+        time.sleep(0.05)
+    except OSError as e:
+        if e.errno == errno.EBUSY:
+            print(f"[GPIO INIT] GPIO {pin} export EBUSY (already in use?), continuing.")
+        else:
+            print(f"[GPIO ERROR] Failed to export GPIO {pin}: {e}")
+            raise
+
+    if os.path.exists(path):
+        print(f"[GPIO INIT] GPIO {pin} exported successfully.")
+    else:
+        print(f"[GPIO WARN] GPIO {pin} export attempted but path not found (likely reserved by kernel).")
+
+    return path
+
+
+def unexport_gpio(pin):
+    """
+    Safe unexport:
+    - If gpioN dir doesn't exist -> skip
+    - Ignore EINVAL/ENOENT (already unexported)
+    """
+    close_value_fd(pin)
+    path = gpio_path(pin)
+    if not os.path.exists(path):
+        return
+
+    try:
+        with open(UNEXPORT_PATH, "w") as f:
+            f.write(str(pin))
+        time.sleep(0.02)
+        print(f"[GPIO CLEANUP] GPIO {pin} unexported.")
+    except OSError as e:
+        if e.errno in (errno.EINVAL, errno.ENOENT):
+            print(f"[GPIO CLEANUP] GPIO {pin} already unexported (EINVAL/ENOENT), skipping.")
+        else:
+            print(f"[GPIO CLEANUP ERROR] Failed to unexport GPIO {pin}: {e}")
+
+
+def force_unexport(pins):
+    """
+    Startup cleanup: unexport stale exports of the given pins only,
+    not every gpioX on the system.
+    """
+    for pin in pins:
+        if os.path.exists(gpio_path(pin)):
+            try:
+                with open(UNEXPORT_PATH, "w") as f:
+                    f.write(str(pin))
+                print(f"[CLEANUP INIT] Unexported stale GPIO {pin}")
+            except Exception as e:
+                print(f"[WARN INIT] Could not unexport {pin}: {e}")
+
+
+# ----------------- DIRECTION / EDGE -----------------
+def set_direction(pin, dirn):
+    dir_path = DIR_PATH.get(pin) or os.path.join(gpio_path(pin), "direction")
+    try:
+        with open(dir_path, "w") as f:
+            f.write(dirn)
+    except OSError as e:
+        print(f"[GPIO ERROR] Failed to set direction on GPIO {pin}: {e}")
+
+
+def set_edge(pin, edge):
+    """
+    edge: "none", "rising", "falling" or "both". Raises OSError if the pin
+    can't generate interrupts.
+    """
+    with open(os.path.join(gpio_path(pin), "edge"), "w") as f:
+        f.write(edge)
+
+
+# ----------------- VALUE I/O -----------------
+# Value files stay open for the life of the process: a toggle or a sample
+# is a single pwrite/pread instead of open + write/read + close.
+_value_fds = {}
+_B0 = b"0"
+_B1 = b"1"
+
+def value_fd(pin):
+    fd = _value_fds.get(pin)
+    if fd is None:
+        fd = os.open(VALUE_PATH.get(pin) or os.path.join(gpio_path(pin), "value"), os.O_RDWR)
+        _value_fds[pin] = fd
+    return fd
+
+
+def close_value_fd(pin):
+    fd = _value_fds.pop(pin, None)
+    if fd is not None:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def write_value(pin, val):
+    """
+    Synchronous write. Used where timing matters (TRIG pulse) and at cleanup.
+    Safe from any thread without a lock: each pin has its own fd and a
+    one-byte pwrite() is atomic. Concurrent writes to the *same* pin are
+    applied in whatever order the kernel sees them (last one wins).
+    """
+    try:
+        os.pwrite(value_fd(pin), _B1 if val else _B0, 0)
+    except OSError as e:
+        print(f"[GPIO ERROR] Failed to write value to GPIO {pin}: {e}")
+
+
+def read_value(pin):
+    """
+    Returns the raw value byte: b"0" or b"1".
+    """
+    try:
+        return os.pread(value_fd(pin), 1, 0)
+    except OSError as e:
+        print(f"[GPIO ERROR] Failed to read value from GPIO {pin}: {e}")
+        return _B0
+
+
+# ----------------- GPIO WRITER THREAD -----------------
+gpio_cmd_queue = queue.SimpleQueue()  # (pin, value), None to stop
+_writer = None
+
+def post_value(pin, val):
+    """
+    Non-blocking write for actuators (motor, buzzer): handed to the single
+    GPIO writer thread so sensor threads never wait on sysfs I/O.
+    """
+    gpio_cmd_queue.put((pin, val))
+
+
+def gpio_writer_thread():
+    while True:
+        cmd = gpio_cmd_queue.get()
+        if cmd is None:
+            break
+        write_value(*cmd)
+
+
+def start_writer():
+    global _writer
+    _writer = threading.Thread(target=gpio_writer_thread, daemon=True)
+    _writer.start()
+
+
+def stop_writer():
+    """
+    Queue the stop sentinel and wait for the writer to exit, so every
+    earlier post_value() has landed before the caller forces pins OFF or
+    unexports them.
+    """
+    global _writer
+    gpio_cmd_queue.put(None)
+    if _writer is not None:
+        _writer.join()
+        _writer = None
@@ -7,12 +7,10 @@
 import os
 import time
 import math
+import struct
+import ctypes
 
-# Try smbus2 first (what we cloned on Astra); fall back to smbus if present
-try:
-    from smbus2 import SMBus
-except ImportError:
-    from smbus2 import SMBus  # type: ignore
+from smbus2 import SMBus, i2c_msg
 
 # ---------------------------
 # I2C CONFIG
@@ -40,10 +38,13 @@ WHO_AM_I       = 0x75
 # ---------------------------
 ACCEL_SF = 16384.0   # LSB/g for ±2g
 GYRO_SF  = 131.0     # LSB/(deg/s) for ±250 dps
+ACCEL_SF_INV = 1.0 / ACCEL_SF
+GYRO_SF_INV  = 1.0 / GYRO_SF
 
 # Sampling
 FS_HZ = 100.0         # 100 Hz loop
 DT    = 1.0 / FS_HZ
+INV_DT = FS_HZ        # jerk = delta * INV_DT, no per-sample division
 
 # Fall detection thresholds (tune on real data)
 FREEFALL_G         = 0.5         # magnitude below this -> likely free fall
@@ -52,34 +53,27 @@ FREEFALL_TO_IMPACT = 0.7         # seconds allowed from freefall to impact
 COOLDOWN_SEC       = 2.0         # avoid repeated triggers
 JERK_THRESH_GPS    = 15.0        # g/s: backup trigger (sudden change)
 
+# Squared thresholds: the state machine compares |a|^2 and |jerk|^2 directly
+FREEFALL_G_SQ  = FREEFALL_G * FREEFALL_G
+IMPACT_G_SQ    = IMPACT_G * IMPACT_G
+JERK_THRESH_SQ = JERK_THRESH_GPS * JERK_THRESH_GPS
+JERK_ARM_G_SQ  = 1.5 * 1.5
+
 # Print pacing
 STATUS_EVERY_SEC   = 1.0
 
-def read_word_2c(bus, addr, reg_h):
-    """Read two registers and convert to signed 16-bit."""
-    hi = bus.read_byte_data(addr, reg_h)
-    lo = bus.read_byte_data(addr, reg_h + 1)
-    val = (hi << 8) | lo
-    if val & 0x8000:
-        val -= 65536
-    return val
-
 def mpu_init(bus):
     # Wake up device
     bus.write_byte_data(MPU_ADDR, PWR_MGMT_1, 0x00)   # clear sleep
     time.sleep(0.05)
 
-    # Set sample rate to 1kHz / (1 + SMPLRT_DIV) -> 100Hz when SMPLRT_DIV = 9
-    bus.write_byte_data(MPU_ADDR, SMPLRT_DIV, 9)
-
-    # DLPF config: 0x03 (~44Hz accel BW, 42Hz gyro BW) for smoother readings
-    bus.write_byte_data(MPU_ADDR, CONFIG, 0x03)
-
-    # Gyro ±250 dps
-    bus.write_byte_data(MPU_ADDR, GYRO_CONFIG, 0x00)
-
-    # Accel ±2g
-    bus.write_byte_data(MPU_ADDR, ACCEL_CONFIG, 0x00)
+    # SMPLRT_DIV, CONFIG, GYRO_CONFIG, ACCEL_CONFIG are consecutive (0x19..0x1C),
+    # so one auto-incrementing block write sets all four:
+    #   SMPLRT_DIV = 9   -> 1kHz / (1 + 9) = 100Hz sample rate
+    #   CONFIG     = 0x03 -> DLPF ~44Hz accel BW, 42Hz gyro BW for smoother readings
+    #   GYRO_CONFIG  = 0x00 -> ±250 dps
+    #   ACCEL_CONFIG = 0x00 -> ±2g
+    bus.write_i2c_block_data(MPU_ADDR, SMPLRT_DIV, [9, 0x03, 0x00, 0x00])
 
     # Verify WHO_AM_I (should read 0x68)
     who = bus.read_byte_data(MPU_ADDR, WHO_AM_I)
@@ -88,26 +82,74 @@ def mpu_init(bus):
     else:
         print("[OK] MPU6050 WHO_AM_I = 0x68")
 
+# ACCEL_XOUT_H..GYRO_ZOUT_L: accel xyz, temp, gyro xyz (big-endian int16).
+# Register-select write + 14-byte read built once and reused every sample.
+_sample_buf = ctypes.create_string_buffer(14)
+_sample_sel = i2c_msg.write(MPU_ADDR, [ACCEL_XOUT_H])
+_sample_rd = i2c_msg.read(MPU_ADDR, 14)
+_sample_rd.buf = ctypes.cast(_sample_buf, ctypes.POINTER(ctypes.c_char))
+_unpack_sample = struct.Struct(">hhhhhhh").unpack_from
+
 def read_accel_gyro(bus):
-    # Raw accelerometer (g's after scaling)
-    ax = read_word_2c(bus, MPU_ADDR, ACCEL_XOUT_H) / ACCEL_SF
-    ay = read_word_2c(bus, MPU_ADDR, ACCEL_XOUT_H + 2) / ACCEL_SF
-    az = read_word_2c(bus, MPU_ADDR, ACCEL_XOUT_H + 4) / ACCEL_SF
+    # One combined write/repeated-START/read; the MPU auto-increments registers
+    bus.i2c_rdwr(_sample_sel, _sample_rd)
+    raw_ax, raw_ay, raw_az, _temp, raw_gx, raw_gy, raw_gz = _unpack_sample(_sample_buf)
+
+    # Accelerometer (g's after scaling)
+    ax = raw_ax * ACCEL_SF_INV
+    ay = raw_ay * ACCEL_SF_INV
+    az = raw_az * ACCEL_SF_INV
 
-    # Raw gyro (deg/s after scaling) – kept in case you want orientation thresholds later
-    gx = read_word_2c(bus, MPU_ADDR, GYRO_XOUT_H) / GYRO_SF
-    gy = read_word_2c(bus, MPU_ADDR, GYRO_XOUT_H + 2) / GYRO_SF
-    gz = read_word_2c(bus, MPU_ADDR, GYRO_XOUT_H + 4) / GYRO_SF
+    # Gyro (deg/s after scaling) – kept in case you want orientation thresholds later
+    gx = raw_gx * GYRO_SF_INV
+    gy = raw_gy * GYRO_SF_INV
+    gz = raw_gz * GYRO_SF_INV
 
     return ax, ay, az, gx, gy, gz
 
-def magnitude3(x, y, z):
-    return math.sqrt(x*x + y*y + z*z)
+# 100 Hz tick: a periodic timerfd keeps the cadence in the kernel, so the
+# loop neither drifts nor depends on how long one iteration took.
+_u64 = struct.Struct("=Q").unpack
+
+class _timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+class _itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", _timespec), ("it_value", _timespec)]
+
+def _libc_timerfd(period):
+    """timerfd_create/timerfd_settime through libc (os only has them from 3.13)."""
+    libc = ctypes.CDLL(None, use_errno=True)
+    tfd = libc.timerfd_create(time.CLOCK_MONOTONIC, 0)
+    if tfd < 0:
+        raise OSError(ctypes.get_errno(), "timerfd_create failed")
+    sec, nsec = divmod(round(period * 1e9), 1_000_000_000)
+    ts = _timespec(sec, nsec)
+    if libc.timerfd_settime(tfd, 0, ctypes.byref(_itimerspec(ts, ts)), None) < 0:
+        err = ctypes.get_errno()
+        os.close(tfd)
+        raise OSError(err, "timerfd_settime failed")
+    return tfd
+
+def open_tick():
+    """Periodic CLOCK_MONOTONIC timerfd at DT, or None if the syscall fails."""
+    try:
+        if hasattr(os, "timerfd_create"):
+            tfd = os.timerfd_create(time.CLOCK_MONOTONIC)
+            os.timerfd_settime(tfd, initial=DT, interval=DT)
+            return tfd
+        return _libc_timerfd(DT)
+    except (OSError, AttributeError) as e:
+        print(f"[WARN] timerfd: {e}")
+        return None
 
 def main():
     print("[INFO] Opening I2C bus:", I2C_BUS)
     with SMBus(I2C_BUS) as bus:
         mpu_init(bus)
+        tfd = open_tick()
+        if tfd is None:
+            print("[INFO] timerfd unavailable, pacing on absolute deadlines")
 
         # Priming values for jerk calculation (Δacc/Δt)
         prev_ax = prev_ay = prev_az = 0.0
@@ -117,61 +159,77 @@ def main():
         freefall_start = 0.0
         cooldown_until = 0.0
         last_status = 0.0
+        next_tick = time.monotonic() + DT
+
+        try:
+            while True:
+                loop_start = time.monotonic()
+
+                ax, ay, az, gx, gy, gz = read_accel_gyro(bus)
+                a_sq = ax*ax + ay*ay + az*az  # in g^2
+
+                # Jerk (g/s)
+                jerk_x = (ax - prev_ax) * INV_DT
+                jerk_y = (ay - prev_ay) * INV_DT
+                jerk_z = (az - prev_az) * INV_DT
+                jerk_sq = jerk_x*jerk_x + jerk_y*jerk_y + jerk_z*jerk_z
 
-        while True:
-            loop_start = time.monotonic()
-
-            ax, ay, az, gx, gy, gz = read_accel_gyro(bus)
-            a_mag = magnitude3(ax, ay, az)  # in g
-
-            # Jerk (g/s)
-            jerk_x = (ax - prev_ax) / DT
-            jerk_y = (ay - prev_ay) / DT
-            jerk_z = (az - prev_az) / DT
-            jerk_mag = magnitude3(jerk_x, jerk_y, jerk_z)
-
-            prev_ax, prev_ay, prev_az = ax, ay, az
-
-            now = loop_start
-
-            # Cooldown: suppress repeated triggers briefly
-            if now < cooldown_until:
-                # Minimal output spam; still print OK periodically
-                pass
-            else:
-                if state == "idle":
-                    # Detect entry to free-fall
-                    if a_mag < FREEFALL_G:
-                        state = "freefall"
-                        freefall_start = now
-                    # Backup jerk-based trigger (impact-y change)
-                    elif jerk_mag > JERK_THRESH_GPS and a_mag > 1.5:
-                        print("FALL DETECTED (jerk trigger)")
-                        cooldown_until = now + COOLDOWN_SEC
-
-                elif state == "freefall":
-                    # If impact soon after freefall -> fall
-                    if a_mag > IMPACT_G and (now - freefall_start) <= FREEFALL_TO_IMPACT:
-                        print("FALL DETECTED (freefall→impact)")
-                        cooldown_until = now + COOLDOWN_SEC
-                        state = "idle"  # reset state machine
-                    # Timeout: no impact, return to idle
-                    elif (now - freefall_start) > FREEFALL_TO_IMPACT:
-                        state = "idle"
-
-            # Status line every second
-            if (now - last_status) >= STATUS_EVERY_SEC:
-                if now >= cooldown_until:
-                    print(f"OK | a_mag={a_mag:.2f} g | jerk={jerk_mag:.1f} g/s | state={state}")
+                prev_ax, prev_ay, prev_az = ax, ay, az
+
+                now = loop_start
+
+                # Cooldown: suppress repeated triggers briefly
+                if now < cooldown_until:
+                    # Minimal output spam; still print OK periodically
+                    pass
+                else:
+                    if state == "idle":
+                        # Detect entry to free-fall
+                        if a_sq < FREEFALL_G_SQ:
+                            state = "freefall"
+                            freefall_start = now
+                        # Backup jerk-based trigger (impact-y change)
+                        elif jerk_sq > JERK_THRESH_SQ and a_sq > JERK_ARM_G_SQ:
+                            print("FALL DETECTED (jerk trigger)")
+                            cooldown_until = now + COOLDOWN_SEC
+
+                    elif state == "freefall":
+                        # If impact soon after freefall -> fall
+                        if a_sq > IMPACT_G_SQ and (now - freefall_start) <= FREEFALL_TO_IMPACT:
+                            print("FALL DETECTED (freefall→impact)")
+                            cooldown_until = now + COOLDOWN_SEC
+                            state = "idle"  # reset state machine
+                        # Timeout: no impact, return to idle
+                        elif (now - freefall_start) > FREEFALL_TO_IMPACT:
+                            state = "idle"
+
+                # Status line every second
+                if (now - last_status) >= STATUS_EVERY_SEC:
+                    a_mag = math.sqrt(a_sq)
+                    jerk_mag = math.sqrt(jerk_sq)
+                    if now >= cooldown_until:
+                        print(f"OK | a_mag={a_mag:.2f} g | jerk={jerk_mag:.1f} g/s | state={state}")
+                    else:
+                        print(f"COOLDOWN | a_mag={a_mag:.2f} g | jerk={jerk_mag:.1f} g/s")
+                    last_status = now
+
+                # Block until the next FS_HZ tick
+                if tfd is not None:
+                    # read() returns the number of expirations since the last read
+                    missed = _u64(os.read(tfd, 8))[0] - 1
+                    if missed:
+                        print(f"[WARN] missed {missed} sample tick(s)")
                 else:
-                    print(f"COOLDOWN | a_mag={a_mag:.2f} g | jerk={jerk_mag:.1f} g/s")
-                last_status = now
-
-            # Sleep to maintain ~FS_HZ
-            elapsed = time.monotonic() - loop_start
-            to_sleep = DT - elapsed
-            if to_sleep > 0:
-                time.sleep(to_sleep)
+                    # sleep to an absolute deadline so loop time adds no drift
+                    to_sleep = next_tick - time.monotonic()
+                    if to_sleep > 0:
+                        time.sleep(to_sleep)
+                        next_tick += DT
+                    else:
+                        next_tick = time.monotonic() + DT
+        finally:
+            if tfd is not None:
+                os.close(tfd)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,592 @@
+"""
+Ultrasonic + haptic motor and MPU6050 fall detection + buzzer, shared by the
+demul*/multithread demos. Entry points pick the pins and call run().
+
+- ultrasonic_task: HC-SR04 distance -> motor ON below 20 cm (every 200 ms)
+- mpu6050_task: freefall followed by impact -> buzzer, ultrasonic paused 15 s
+- sensor_loop: runs both tasks off one deadline heap in a single thread
+"""
+
+import os, time, threading, signal, sys, select, struct, ctypes, heapq, collections
+import numpy as np
+from smbus2 import SMBus, i2c_msg
+
+try:
+    from numba import njit           # optional: compiles fall_step to native code
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    def njit(*args, **kwargs):
+        return lambda f: f
+
+from gpio_sysfs import (
+    gpio_path, export_gpio, unexport_gpio, set_direction, set_edge,
+    value_fd, write_value, read_value, post_value, start_writer, stop_writer,
+)
+
+try:
+    import gpio_cdev                 # libgpiod v2 bindings for the ultrasonic
+except ImportError:
+    gpio_cdev = None
+
+# Optional C pulse timer (build: cc -O2 -shared -fPIC -o _measure.so _measure.c)
+try:
+    _measure = ctypes.CDLL(os.path.join(os.path.dirname(os.path.abspath(__file__)), "_measure.so"))
+    _measure.pulse.restype = ctypes.c_double
+    _measure.pulse.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_int)
+except OSError:
+    _measure = None
+
+# ----------------- GPIO DEFINITIONS (set by run()) -----------------
+TRIG_GPIO   = 426
+ECHO_GPIO   = 485
+MOTOR_GPIO  = 484
+BUZZER_GPIO = 487   # may be reserved by kernel; treated as optional
+
+stop_event = threading.Event()
+ultrasonic_paused = False        # set by mpu6050_task for the post-fall pause
+BUZZER_AVAILABLE = True          # will be set false if the buzzer GPIO is not usable
+
+# Set in run() when TRIG/ECHO are driven through the GPIO character device;
+# those two pins are then left out of sysfs.
+ultra = None
+SYSFS_PINS = (TRIG_GPIO, ECHO_GPIO, MOTOR_GPIO, BUZZER_GPIO)
+_sensor_thread = None            # joined by cleanup() before the writer stops
+
+
+# ----------------- LOGGING -----------------
+# The sensor thread never blocks on stdout: log() appends to a bounded deque
+# (oldest lines dropped if the printer falls behind) and printer_thread
+# writes them out.
+_log_q = collections.deque(maxlen=512)
+_log_cv = threading.Condition()
+
+def log(msg):
+    _log_q.append(msg)
+    with _log_cv:
+        _log_cv.notify()
+
+
+def flush_log():
+    # popleft until empty: safe if cleanup() and the printer drain together
+    try:
+        while True:
+            sys.stdout.write(_log_q.popleft() + "\n")
+    except IndexError:
+        pass
+    sys.stdout.flush()
+
+
+def printer_thread():
+    while True:
+        with _log_cv:
+            _log_cv.wait_for(lambda: _log_q)
+        flush_log()
+
+
+# ----------------- ULTRASONIC + HAPTIC -----------------
+# epoll on ECHO's value fd (sysfs edge="both"); None -> plain polling
+echo_epoll = None
+
+def setup_echo_edge(echo):
+    """
+    Arm sysfs edge interrupts on ECHO so measure() can sleep in epoll
+    instead of spinning on read_value().
+    """
+    global echo_epoll
+    try:
+        set_edge(echo, "both")
+        fd = value_fd(echo)
+        os.pread(fd, 1, 0)  # consume the initial state before arming
+        ep = select.epoll()
+        ep.register(fd, select.EPOLLPRI | select.EPOLLERR | select.EPOLLET)
+        echo_epoll = ep
+        print(f"[GPIO INIT] GPIO {echo} edge=both, using epoll for echo timing.")
+    except OSError as e:
+        print(f"[GPIO WARN] Edge interrupts unavailable on GPIO {echo} ({e}), polling instead.")
+        echo_epoll = None
+
+
+def wait_echo_edge(echo, timeout):
+    """
+    Block until the next ECHO edge; returns the level after it (b"0"/b"1")
+    or None on timeout.
+    """
+    if not echo_epoll.poll(timeout):
+        return None
+    return os.pread(value_fd(echo), 1, 0)  # also re-arms the notification
+
+
+# Polling fallback: busy reads for the first SPIN_NS so short edges are
+# caught without delay, then 10 us sleeps so long waits don't hold the GIL.
+# Bounded by time, not reads: a sysfs pread costs a few us.
+SPIN_NS = 30_000
+
+# Whole-ping budget from the trigger. measure() runs inline in sensor_loop,
+# so it must return well inside one MPU period (DT = 10 ms) or fall samples
+# are delayed. 6 ms of echo caps the range at about 1 m, far past the 20 cm
+# motor threshold; anything farther reads as a timeout.
+ECHO_TIMEOUT_NS = 6_000_000
+
+def poll_echo_level(echo, level, deadline):
+    """
+    Wait until ECHO reads `level` (b"0"/b"1"). Returns False once
+    time.monotonic_ns() passes deadline.
+    """
+    spin_until = time.monotonic_ns() + SPIN_NS
+    while read_value(echo) != level:
+        now = time.monotonic_ns()
+        if now > deadline:
+            return False
+        if now > spin_until:
+            time.sleep(0.00001)
+    return True
+
+
+def _busy_wait_ns(ns):
+    # Spin instead of time.sleep(), which overshoots short waits by a timer tick
+    end = time.monotonic_ns() + ns
+    while time.monotonic_ns() < end:
+        pass
+
+
+def measure(trig, echo):
+    """
+    One ping: distance in cm, or None on timeout / out of range. Bounded by
+    ECHO_TIMEOUT_NS from the trigger on every backend. No settle sleep: each
+    ping leaves TRIG low and pings are ULTRASONIC_PERIOD apart.
+    """
+    if ultra is not None:
+        return ultra.measure(timeout=ECHO_TIMEOUT_NS * 1e-9, settle=0)
+
+    write_value(trig, 0)
+
+    if echo_epoll is not None and _measure is not None:
+        # trigger + both edge waits in C, GIL released for the whole ping
+        us = _measure.pulse(value_fd(trig), value_fd(echo), ECHO_TIMEOUT_NS // 1_000_000)
+        return None if us < 0 else us * 0.01715  # cm
+
+    if echo_epoll is not None:
+        # drop any edge left over from the previous ping
+        echo_epoll.poll(0)
+        os.pread(value_fd(echo), 1, 0)
+
+    write_value(trig, 1)
+    _busy_wait_ns(10_000)  # 10 us TRIG pulse
+    write_value(trig, 0)
+    deadline = time.monotonic_ns() + ECHO_TIMEOUT_NS
+
+    if echo_epoll is not None:
+        # kernel wakes us on each edge; no Python polling loop
+        left = max(deadline - time.monotonic_ns(), 0)
+        if wait_echo_edge(echo, left * 1e-9) != b"1":
+            return None  # timeout, or pulse already over before we woke
+        start = time.monotonic_ns()
+        if wait_echo_edge(echo, max(deadline - start, 0) * 1e-9) is None:
+            return None
+        end = time.monotonic_ns()
+        return (end - start) * 17150e-9  # cm
+
+    if not poll_echo_level(echo, b"1", deadline):
+        return None
+    start = time.monotonic_ns()
+
+    if not poll_echo_level(echo, b"0", deadline):
+        return None
+    end = time.monotonic_ns()
+
+    return (end - start) * 17150e-9  # cm
+
+
+# Real-time placement of the sensor thread (see sensor_loop)
+SENSOR_CPU = 3
+SENSOR_RT_PRIO = 80
+
+def make_realtime(tag, prio, core):
+    """
+    Run the calling thread under SCHED_FIFO on one core so its timing isn't
+    stretched by CFS preemption or migration. Needs root / CAP_SYS_NICE;
+    otherwise logs and keeps the default policy.
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(prio))
+        print(f"[{tag}] SCHED_FIFO priority {prio}")
+    except (OSError, AttributeError) as e:
+        print(f"[{tag}] SCHED_FIFO unavailable ({e}), using default scheduling.")
+    try:
+        ncpu = os.cpu_count() or 1
+        os.sched_setaffinity(0, {core % ncpu})
+    except (OSError, AttributeError):
+        pass
+
+
+ULTRASONIC_PERIOD = 0.2
+
+def ultrasonic_task():
+    """
+    Scheduler task: one ping + motor update per step; yields the delay
+    until the next step.
+    """
+    motor_state = False
+    active = False
+    last_seen = 0
+
+    while True:
+        if not ultrasonic_paused:
+            d = measure(TRIG_GPIO, ECHO_GPIO)
+
+            if d:
+                if __debug__:  # per-ping trace; dropped under python -O
+                    log(f"[ULTRASONIC] {d:.1f} cm")
+                if d < 20:
+                    active = True
+                    last_seen = time.monotonic()
+                elif time.monotonic() - last_seen > 1.5:
+                    active = False
+            else:
+                log("[ULTRASONIC] timeout")
+
+            if active and not motor_state:
+                post_value(MOTOR_GPIO, 1)
+                motor_state = True
+                log("[MOTOR] ON")
+            elif not active and motor_state:
+                post_value(MOTOR_GPIO, 0)
+                motor_state = False
+                log("[MOTOR] OFF")
+
+        else:
+            post_value(MOTOR_GPIO, 0)
+            log("[ULTRASONIC] Paused after fall detection.")
+
+        yield ULTRASONIC_PERIOD
+
+
+# ----------------- MPU6050 + BUZZER -----------------
+# NOTE: set I2C_BUS = <bus index where MPU shows up in i2cdetect>
+MPU_ADDR = 0x68       # or 0x69 if AD0 pulled high
+I2C_BUS = 0           # CHANGE THIS once you know the correct bus
+
+PWR_MGMT_1 = 0x6B
+ACCEL_XOUT_H = 0x3B
+
+ACCEL_SCALE = 16384.0
+ACCEL_SCALE_INV = 1.0 / ACCEL_SCALE
+ACCEL_SCALE_INV_SQ = ACCEL_SCALE_INV * ACCEL_SCALE_INV
+DT = 0.01
+FREEFALL_G = 0.3
+IMPACT_G = 3.0
+# Thresholds are compared against squared magnitudes: no sqrt per sample
+FREEFALL_G_SQ = FREEFALL_G * FREEFALL_G
+IMPACT_G_SQ = IMPACT_G * IMPACT_G
+FREEFALL_TO_IMPACT = 1.0
+WINDOW = 8              # samples kept for thresholding (80 ms at DT)
+FREEFALL_SAMPLES = 3    # low-g samples in the window needed to call freefall
+COOLDOWN_SEC = 2.0
+
+def export_buzzer():
+    """
+    Try to make buzzer GPIO usable. If it's reserved by the kernel
+    (export EBUSY and the gpioN/ directory never appears),
+    we mark BUZZER_AVAILABLE = False so the rest of the code skips beeps.
+    """
+    global BUZZER_AVAILABLE
+    export_gpio(BUZZER_GPIO)
+
+    if not os.path.exists(gpio_path(BUZZER_GPIO)):
+        print(f"[BUZZER] GPIO {BUZZER_GPIO} not available (reserved by kernel). Disabling buzzer.")
+        BUZZER_AVAILABLE = False
+        return
+
+    set_direction(BUZZER_GPIO, "out")
+    BUZZER_AVAILABLE = True
+    print("[BUZZER] Ready.")
+
+
+def beep_buzzer(duration=3):
+    """
+    Use as `yield from beep_buzzer(...)` inside a task: the other tasks keep
+    running while the buzzer is on.
+    """
+    if not BUZZER_AVAILABLE:
+        log("[BUZZER] Not available, skipping beep.")
+        yield duration
+        return
+
+    log("[BUZZER] Beeping...")
+    post_value(BUZZER_GPIO, 1)
+    yield duration
+    post_value(BUZZER_GPIO, 0)
+    log("[BUZZER] Done.")
+
+
+# Preallocated accel transfer: register-select write + 6-byte read into a
+# fixed buffer (registers auto-increment), reused for every sample.
+# _accel_raw is a uint8 view of the same memory for fall_step().
+_accel_buf = ctypes.create_string_buffer(6)
+_accel_sel = i2c_msg.write(MPU_ADDR, [ACCEL_XOUT_H])
+_accel_rd = i2c_msg.read(MPU_ADDR, 6)
+_accel_rd.buf = ctypes.cast(_accel_buf, ctypes.POINTER(ctypes.c_char))
+_accel_raw = np.frombuffer(_accel_buf, dtype=np.uint8)
+
+
+# Fall state machine codes (ints so fall_step compiles under numba)
+IDLE, FREEFALL = 0, 1
+EV_NONE, EV_FREEFALL, EV_FALL = 0, 1, 2
+
+@njit(cache=True)
+def _i16be(raw, i):
+    v = (int(raw[i]) << 8) | int(raw[i + 1])
+    return v - 65536 if v >= 0x8000 else v
+
+
+@njit(cache=True, nogil=True)
+def _fall_update(win, idx, new_sq, state, freefall_start, now, armed):
+    """
+    Store the new sample's squared magnitude in win[idx], then (if armed,
+    i.e. not in cooldown) advance the freefall -> impact state machine:
+    freefall counts low-g samples across the window, impact only looks at
+    the new sample, so it must come after the freefall.
+    Returns (idx, state, freefall_start, event).
+    """
+    win[idx] = new_sq
+    idx = (idx + 1) % WINDOW
+
+    low = 0
+    for m in win:
+        if m < FREEFALL_G_SQ:
+            low += 1
+
+    event = EV_NONE
+    if armed:
+        # Several low-g samples, not a single dip, before calling freefall
+        if state == IDLE and low >= FREEFALL_SAMPLES:
+            state = FREEFALL
+            freefall_start = now
+            event = EV_FREEFALL
+        elif state == FREEFALL:
+            if new_sq > IMPACT_G_SQ and (now - freefall_start) <= FREEFALL_TO_IMPACT:
+                state = IDLE
+                event = EV_FALL
+            elif (now - freefall_start) > FREEFALL_TO_IMPACT:
+                state = IDLE
+
+    return idx, state, freefall_start, event
+
+
+@njit(cache=True, nogil=True)
+def _fall_step_nb(raw, win, idx, state, freefall_start, now, armed):
+    x, y, z = _i16be(raw, 0), _i16be(raw, 2), _i16be(raw, 4)
+    return _fall_update(win, idx, (x * x + y * y + z * z) * ACCEL_SCALE_INV_SQ,
+                        state, freefall_start, now, armed)
+
+
+_unpack_accel = struct.Struct(">hhh").unpack_from
+
+def _fall_step_py(raw, win, idx, state, freefall_start, now, armed):
+    x, y, z = _unpack_accel(raw)
+    return _fall_update(win, idx, (x * x + y * y + z * z) * ACCEL_SCALE_INV_SQ,
+                        state, freefall_start, now, armed)
+
+
+# fall_step(raw, win, idx, state, freefall_start, now, armed): decode one
+# 6-byte accel sample and run _fall_update on it. Without numba the njit
+# above is a no-op, so use plain ints/floats and a list window instead of
+# per-element numpy scalars, which are ~50x slower in the interpreter.
+fall_step = _fall_step_nb if HAVE_NUMBA else _fall_step_py
+
+
+def open_mpu():
+    """
+    Export the buzzer, open the I2C bus and wake the MPU. Returns the bus,
+    or None if the MPU isn't reachable (the ultrasonic keeps running).
+    """
+    export_buzzer()
+
+    # If buzzer unavailable, we still run MPU logic, just log instead of beeping
+    print(f"[MPU] Opening I2C bus {I2C_BUS} for address 0x{MPU_ADDR:02X}...")
+    try:
+        bus = SMBus(I2C_BUS)
+    except FileNotFoundError:
+        print(f"[MPU ERROR] /dev/i2c-{I2C_BUS} not found. Check 'i2cdetect -l' and update I2C_BUS.")
+        return None
+
+    # OSError: [Errno 121] Remote I/O error here means nothing ACKed at MPU_ADDR
+    try:
+        bus.write_byte_data(MPU_ADDR, PWR_MGMT_1, 0)
+    except OSError as e:
+        print(f"[MPU ERROR] Failed to talk to device at 0x{MPU_ADDR:02X} on bus {I2C_BUS}: {e}")
+        print("[MPU HINT] Run 'i2cdetect -y -r <bus>' and verify that 0x68 or 0x69 shows up.")
+        print("[MPU HINT] Also check wiring: VCC, GND, SDA, SCL to the correct Astra pins.")
+        bus.close()
+        return None
+
+    return bus
+
+
+def mpu6050_task(bus):
+    """
+    Scheduler task: one accel sample + fall state machine per step, every DT.
+    """
+    global ultrasonic_paused
+    cooldown_until = 0.0
+    state = IDLE
+    freefall_start = 0.0
+
+    # Circular window of the last WINDOW squared magnitudes; starts at rest (1 g)
+    win = np.ones(WINDOW) if HAVE_NUMBA else [1.0] * WINDOW
+    idx = 0
+
+    log("[START] MPU + Buzzer Fall Detection Running...")
+
+    while True:
+        try:
+            # One combined write/repeated-START/read into _accel_buf
+            bus.i2c_rdwr(_accel_sel, _accel_rd)
+        except OSError as e:
+            log(f"[MPU ERROR] I2C read error: {e}")
+            yield 0.1
+            continue
+
+        now = time.monotonic()
+        idx, state, freefall_start, event = fall_step(
+            _accel_raw, win, idx, state, freefall_start, now, now >= cooldown_until)
+
+        # I/O (log, buzzer, pause) stays out here in Python
+        if event == EV_FREEFALL:
+            log("[DETECT] Freefall suspected...")
+
+        elif event == EV_FALL:
+            log("[FALL] Impact confirmed — Fall detected!")
+            yield from beep_buzzer(duration=3)
+            ultrasonic_paused = True
+            cooldown_until = now + COOLDOWN_SEC
+            win[:] = [1.0] * WINDOW  # don't re-trigger on the old fall
+            idx = 0
+            log("[SYSTEM] Ultrasonic paused for 15 seconds...")
+            yield 15
+            ultrasonic_paused = False
+            log("[SYSTEM] Ultrasonic resumed.")
+
+        yield DT
+
+
+# ----------------- SCHEDULER -----------------
+def sensor_loop():
+    """
+    One real-time thread for both sensors. Tasks are generators that yield
+    the delay until their next step; a min-heap of absolute deadlines picks
+    which runs next, so MPU samples land on their DT grid without a second
+    thread (or a semaphore) competing for the GIL. On overrun a task is
+    rescheduled from now instead of bursting to catch up.
+
+    Steps run inline, so none may block for longer than DT: measure() is
+    capped by ECHO_TIMEOUT_NS, and waits longer than that are yielded.
+    """
+    make_realtime("SENSORS", SENSOR_RT_PRIO, SENSOR_CPU)
+
+    tasks = [ultrasonic_task()]
+    bus = open_mpu()
+    if bus is not None:
+        tasks.append(mpu6050_task(bus))
+
+    t0 = time.monotonic_ns()
+    heap = [(t0, i, task) for i, task in enumerate(tasks)]  # i breaks ties
+    heapq.heapify(heap)
+
+    try:
+        while heap and not stop_event.is_set():
+            deadline, i, task = heap[0]
+            remaining = deadline - time.monotonic_ns()
+            if remaining > 0:
+                stop_event.wait(remaining * 1e-9)
+                continue
+
+            try:
+                delay = next(task)
+            except StopIteration:
+                heapq.heappop(heap)
+                continue
+
+            nxt = deadline + int(delay * 1e9)
+            heapq.heapreplace(heap, (max(nxt, time.monotonic_ns()), i, task))
+    finally:
+        if bus is not None:
+            bus.close()
+        # queued behind any pending ON, so the writer applies it last
+        post_value(MOTOR_GPIO, 0)
+        log("[MOTOR] forced OFF")
+
+
+# ----------------- CLEANUP HANDLER -----------------
+def cleanup(sig=None, frame=None):
+    stop_event.set()
+    print("\n[CLEANUP] Stopping threads and unexporting GPIOs...")
+    # Order matters: the sensor thread stops posting, then the writer drains
+    # its queue and exits, and only then are pins forced OFF and unexported
+    if _sensor_thread is not None:
+        _sensor_thread.join(timeout=2.0)
+    stop_writer()
+    flush_log()
+
+    if ultra is not None:
+        ultra.close()
+
+    for pin in SYSFS_PINS:
+        try:
+            write_value(pin, 0)
+        except Exception:
+            pass
+        unexport_gpio(pin)
+
+    print("[CLEANUP] All GPIOs unexported. Exiting safely.")
+    sys.exit(0)
+
+
+# ----------------- MAIN EXECUTION -----------------
+def run(trig_gpio, echo_gpio, motor_gpio, buzzer_gpio):
+    """
+    Start the sensor thread on the given sysfs pin numbers and block until
+    Ctrl+C.
+    """
+    global TRIG_GPIO, ECHO_GPIO, MOTOR_GPIO, BUZZER_GPIO, SYSFS_PINS, ultra, _sensor_thread
+    TRIG_GPIO, ECHO_GPIO = trig_gpio, echo_gpio
+    MOTOR_GPIO, BUZZER_GPIO = motor_gpio, buzzer_gpio
+    SYSFS_PINS = (TRIG_GPIO, ECHO_GPIO, MOTOR_GPIO, BUZZER_GPIO)
+
+    signal.signal(signal.SIGINT, cleanup)
+
+    print("[SYSTEM] Starting Wearable Navigation System...")
+
+    # Ultrasonic via libgpiod edge events when available, else sysfs polling
+    if gpio_cdev is not None:
+        try:
+            ultra = gpio_cdev.Ultrasonic(TRIG_GPIO, ECHO_GPIO)
+            SYSFS_PINS = (MOTOR_GPIO, BUZZER_GPIO)
+            print("[GPIO INIT] Ultrasonic on GPIO character device (edge events).")
+        except (OSError, ValueError) as e:
+            print(f"[GPIO WARN] libgpiod ultrasonic unavailable ({e}), using sysfs.")
+
+    # Export our GPIOs once (idempotent, EBUSY-safe)
+    for pin in SYSFS_PINS:
+        export_gpio(pin)
+
+    # Directions are set once here; measure() and the loops only do value I/O
+    set_direction(MOTOR_GPIO, "out")
+    if ultra is None:
+        set_direction(TRIG_GPIO, "out")
+        set_direction(ECHO_GPIO, "in")
+        setup_echo_edge(ECHO_GPIO)
+
+    start_writer()
+
+    threading.Thread(target=printer_thread, daemon=True).start()
+    _sensor_thread = threading.Thread(target=sensor_loop, daemon=True)
+    _sensor_thread.start()
+
+    # Block until cleanup() (SIGINT) or a worker sets stop_event
+    try:
+        stop_event.wait()
+    except KeyboardInterrupt:
+        pass
+    cleanup()
@@ -2,11 +2,17 @@ import os
 import time
 import threading
 
+from gpio_sysfs import value_fd, close_value_fd   # shared per-pin value fds
+
 # ✅ GPIO assignments
 TRIG_GPIO = 426     # TRIG of Ultrasonic
 ECHO_GPIO = 485     # ECHO of Ultrasonic
 MOTOR_GPIO = 484    # GPIO controlling the haptic motor via NPN transistor
 
+# Precomputed value payloads: no str() per access
+_ZERO = b"0"
+_ONE = b"1"
+
 def export_gpio(pin):
     gpio_path = f"/sys/class/gpio/gpio{pin}"
     if not os.path.exists(gpio_path):
@@ -21,6 +27,7 @@ def export_gpio(pin):
 
 def unexport_gpio(pin):
     gpio_path = f"/sys/class/gpio/gpio{pin}"
+    close_value_fd(pin)
     if os.path.exists(gpio_path):
         try:
             with open("/sys/class/gpio/unexport", "w") as f:
@@ -37,47 +44,43 @@ def set_direction(pin_path, direction):
     except Exception as e:
         print(f"[ERROR] Failed to set direction: {e}")
 
-def write_value(pin_path, value):
+def write_value(pin, value):
     try:
-        with open(os.path.join(pin_path, "value"), "w") as f:
-            f.write(str(value))
-        # print(f"[DEBUG] Wrote value {value} to {pin_path}")
+        os.pwrite(value_fd(pin), _ONE if value else _ZERO, 0)
+        # print(f"[DEBUG] Wrote value {value} to GPIO {pin}")
     except Exception as e:
         print(f"[ERROR] Failed to write value: {e}")
 
-def read_value(pin_path):
+def read_value(pin):
     try:
-        with open(os.path.join(pin_path, "value"), "r") as f:
-            return f.read().strip()
+        return os.pread(value_fd(pin), 1, 0)
     except Exception as e:
         print(f"[ERROR] Failed to read value: {e}")
-        return "0"
-
-def measure_distance():
-    trig_path = export_gpio(TRIG_GPIO)
-    echo_path = export_gpio(ECHO_GPIO)
+        return _ZERO
 
-    if not trig_path or not echo_path:
-        return None
+def _busy_wait_ns(ns):
+    # time.sleep() can't do 10µs (timer slack); spin on the monotonic clock
+    end = time.monotonic_ns() + ns
+    while time.monotonic_ns() < end:
+        pass
 
-    set_direction(trig_path, "out")
-    set_direction(echo_path, "in")
-
-    write_value(trig_path, 0)
+def measure_distance(trig, echo):
+    # Pins are exported and their directions set once in __main__
+    write_value(trig, 0)
     time.sleep(0.05)
 
-    write_value(trig_path, 1)
-    time.sleep(0.00001)
-    write_value(trig_path, 0)
+    write_value(trig, 1)
+    _busy_wait_ns(10_000)
+    write_value(trig, 0)
 
     timeout = time.time() + 0.2
-    while read_value(echo_path) == "0":
+    while read_value(echo) == _ZERO:
         if time.time() > timeout:
             return None
     pulse_start = time.time()
 
     timeout = time.time() + 0.2
-    while read_value(echo_path) == "1":
+    while read_value(echo) == _ONE:
         if time.time() > timeout:
             return None
     pulse_end = time.time()
@@ -87,7 +90,7 @@ def measure_distance():
     return distance_cm
 
 # ✅ Motor Control Thread
-def control_motor(stop_event):
+def control_motor(stop_event, trig, echo):
     motor_path = export_gpio(MOTOR_GPIO)
     set_direction(motor_path, "out")
 
@@ -95,33 +98,42 @@ def control_motor(stop_event):
     active = False
 
     while not stop_event.is_set():
-        distance = measure_distance()
+        distance = measure_distance(trig, echo)
         if distance is None:
             print("[INFO] No object detected")
         elif distance < 20:
             print(f"[INFO] Object at {distance:.2f} cm — motor ON")
-            write_value(motor_path, 1)
+            write_value(MOTOR_GPIO, 1)
             active = True
         else:
             if active:
                 print(f"[INFO] Object moved away — motor OFF, cooldown for {cooldown}s")
-                write_value(motor_path, 0)
+                write_value(MOTOR_GPIO, 0)
                 active = False
-                time.sleep(cooldown)
+                if stop_event.wait(cooldown):
+                    break
             else:
-                write_value(motor_path, 0)
+                write_value(MOTOR_GPIO, 0)
                 print(f"[INFO] Distance {distance:.2f} cm — motor remains OFF")
 
-        time.sleep(0.3)
+        # Event.wait instead of sleep so a stop request is seen immediately
+        if stop_event.wait(0.3):
+            break
 
 # ✅ Main loop
 if __name__ == "__main__":
     stop_event = threading.Event()
+    trig_path = export_gpio(TRIG_GPIO)
+    echo_path = export_gpio(ECHO_GPIO)
+    if not trig_path or not echo_path:
+        raise SystemExit("[ERROR] Ultrasonic GPIOs unavailable")
+    set_direction(trig_path, "out")
+    set_direction(echo_path, "in")
+
     try:
-        motor_thread = threading.Thread(target=control_motor, args=(stop_event,))
+        motor_thread = threading.Thread(target=control_motor, args=(stop_event, TRIG_GPIO, ECHO_GPIO))
         motor_thread.start()
-        while True:
-            time.sleep(1)
+        stop_event.wait()
 
     except KeyboardInterrupt:
         print("\n[INFO] Stopping program...")
@@ -1,13 +1,19 @@
-import os, time, threading, signal, sys
+import os, time, threading, signal, sys, select
+from gpio_sysfs import value_fd, close_value_fd   # shared per-pin value fds
+
+try:
+    import gpio_cdev     # libgpiod v2: kernel-timestamped echo edges
+except ImportError:
+    gpio_cdev = None
 
 TRIG_GPIO = 426
 ECHO_GPIO = 485
 MOTOR_GPIO = 484
 
 stop_event = threading.Event()
-lock = threading.Lock()
-obstacle_detected = False
-last_seen = 0
+obstacle_detected = False        # written only by ultrasonic_loop; one GIL-atomic store
+ultra = None                     # gpio_cdev.Ultrasonic when TRIG/ECHO are on cdev
+SYSFS_PINS = (TRIG_GPIO, ECHO_GPIO, MOTOR_GPIO)
 
 def gpio_path(pin): return f"/sys/class/gpio/gpio{pin}"
 
@@ -17,67 +23,104 @@ def export_gpio(pin):
     return gpio_path(pin)
 
 def unexport_gpio(pin):
+    close_value_fd(pin)
     if os.path.exists(gpio_path(pin)):
         with open("/sys/class/gpio/unexport","w") as f: f.write(str(pin))
 
 def set_direction(path, dirn):
     with open(os.path.join(path,"direction"),"w") as f: f.write(dirn)
 
-def write_value(path, val):
-    with open(os.path.join(path,"value"),"w") as f: f.write(str(val))
+def write_value(pin, val):
+    os.pwrite(value_fd(pin), b"1" if val else b"0", 0)
 
-def read_value(path):
-    with open(os.path.join(path,"value")) as f: return f.read().strip()
+def read_value(pin):
+    return os.pread(value_fd(pin), 1, 0)   # b"0" / b"1"
 
 # --- ultrasonic ---
+TIMEOUT_NS = 200_000_000   # echo wait limit, monotonic clock
+
+def _busy_wait_ns(ns):
+    # sleep() can't do 10us (timer slack); spin on the monotonic clock
+    end=time.monotonic_ns()+ns
+    while time.monotonic_ns()<end: pass
+
+echo_poll = None           # select.poll on ECHO's value fd once edge=both is armed
+
+def setup_echo_edge(echo):
+    global echo_poll
+    try:
+        with open(os.path.join(gpio_path(echo),"edge"),"w") as f: f.write("both")
+        fd=value_fd(echo); os.pread(fd,1,0)   # clear initial state
+        p=select.poll(); p.register(fd, select.POLLPRI|select.POLLERR)
+        echo_poll=p
+    except OSError as e:
+        print(f"[ULTRASONIC] edge interrupts unavailable ({e}), polling echo")
+
+def wait_edge(echo, timeout_ms):
+    # sleeps in the kernel until ECHO changes; the pread re-arms POLLPRI
+    if not echo_poll.poll(timeout_ms): return None
+    return os.pread(value_fd(echo),1,0)
+
 def measure(trig, echo):
-    set_direction(trig,"out"); set_direction(echo,"in")
+    if ultra is not None:
+        return ultra.measure()   # echo width from edge event timestamps
+
+    if echo_poll is not None and echo_poll.poll(0):
+        os.pread(value_fd(echo),1,0)   # drop a stale edge from the last ping
+
     write_value(trig,0); time.sleep(0.05)
-    write_value(trig,1); time.sleep(0.00001)
+    write_value(trig,1); _busy_wait_ns(10_000)
     write_value(trig,0)
 
-    t0=time.time(); 
-    while read_value(echo)=="0":
-        if time.time()-t0>0.2: return None
-    start=time.time()
+    if echo_poll is not None:
+        if wait_edge(echo,200)!=b"1": return None
+        start=time.monotonic_ns()
+        if wait_edge(echo,200) is None: return None
+        end=time.monotonic_ns()
+        return (end-start)*17150e-9   # cm
+
+    t0=time.monotonic_ns()
+    while read_value(echo)==b"0":
+        if time.monotonic_ns()-t0>TIMEOUT_NS: return None
+    start=time.monotonic_ns()
 
-    while read_value(echo)=="1":
-        if time.time()-start>0.2: return None
-    end=time.time()
-    return (end-start)*17150   # cm
+    while read_value(echo)==b"1":
+        if time.monotonic_ns()-start>TIMEOUT_NS: return None
+    end=time.monotonic_ns()
+    return (end-start)*17150e-9   # cm
 
 def ultrasonic_loop(trig, echo):
-    global obstacle_detected,last_seen
+    global obstacle_detected
+    last_seen=0
     while not stop_event.is_set():
         d=measure(trig,echo)
         if d:
             print(f"[ULTRASONIC] {d:.1f} cm")
-            with lock:
-                if d<20: obstacle_detected=True; last_seen=time.time()
-                elif time.time()-last_seen>1.5: obstacle_detected=False
+            if d<20: obstacle_detected=True; last_seen=time.monotonic()
+            elif time.monotonic()-last_seen>1.5: obstacle_detected=False
         else: print("[ULTRASONIC] timeout")
-        time.sleep(0.2)
+        if stop_event.wait(0.2): break   # wakes at once on shutdown
 
 def motor_loop(motor):
-    set_direction(motor,"out")
     motor_state=False
     while not stop_event.is_set():
-        with lock: active=obstacle_detected
+        active=obstacle_detected
         if active and not motor_state:
             write_value(motor,1); motor_state=True
             print("[MOTOR] ON")
         elif not active and motor_state:
             write_value(motor,0); motor_state=False
             print("[MOTOR] OFF")
-        time.sleep(0.1)
+        if stop_event.wait(0.1): break
     # failsafe off
     write_value(motor,0)
     print("[MOTOR] forced OFF")
 
 def cleanup():
     print("\n[CLEANUP] Shutting down safely...")
-    for pin in (TRIG_GPIO,ECHO_GPIO,MOTOR_GPIO):
-        try: write_value(gpio_path(pin),0)
+    if ultra is not None: ultra.close()
+    for pin in SYSFS_PINS:
+        try: write_value(pin,0)
         except: pass
         unexport_gpio(pin)
     print("[CLEANUP] GPIOs unexported. Goodbye.")
@@ -91,12 +134,22 @@ signal.signal(signal.SIGINT,handle_signal)
 signal.signal(signal.SIGTERM,handle_signal)
 
 if __name__=="__main__":
-    trig=export_gpio(TRIG_GPIO)
-    echo=export_gpio(ECHO_GPIO)
-    motor=export_gpio(MOTOR_GPIO)
+    if gpio_cdev is not None:
+        try:
+            ultra=gpio_cdev.Ultrasonic(TRIG_GPIO,ECHO_GPIO)
+            SYSFS_PINS=(MOTOR_GPIO,)
+            print("[ULTRASONIC] using GPIO character device (edge events)")
+        except (OSError,ValueError) as e:
+            print(f"[ULTRASONIC] libgpiod unavailable ({e}), using sysfs")
+    trig=echo=None
+    if ultra is None:
+        trig,echo=TRIG_GPIO,ECHO_GPIO
+        set_direction(export_gpio(trig),"out"); set_direction(export_gpio(echo),"in")   # once, not per ping
+        setup_echo_edge(echo)
+    motor=MOTOR_GPIO
+    set_direction(export_gpio(motor),"out")
     t1=threading.Thread(target=ultrasonic_loop,args=(trig,echo))
     t2=threading.Thread(target=motor_loop,args=(motor,))
     t1.start(); t2.start()
-    while not stop_event.is_set():
-        time.sleep(0.1)
+    stop_event.wait()   # the signal handler sets it
 
@@ -1,6 +1,8 @@
 import os
 import time
 
+from gpio_sysfs import value_fd, close_value_fd   # shared per-pin value fds
+
 # ✅ GPIO assignments from verified mapping
 TRIG_GPIO = 426  # GPIO10 → Pin 12
 ECHO_GPIO = 485  # GPIO37 → Pin 22
@@ -20,6 +22,7 @@ def export_gpio(pin):
 
 def unexport_gpio(pin):
     gpio_path = f"/sys/class/gpio/gpio{pin}"
+    close_value_fd(pin)
     if os.path.exists(gpio_path):
         try:
             with open("/sys/class/gpio/unexport", "w") as f:
@@ -36,45 +39,40 @@ def set_direction(pin_path, direction):
     except Exception as e:
         print(f"[ERROR] Failed to set direction: {e}")
 
-def write_value(pin_path, value):
+def write_value(pin, value):
     try:
-        with open(os.path.join(pin_path, "value"), "w") as f:
-            f.write(str(value))
-        print(f"[DEBUG] Wrote value {value} to {pin_path}")
+        os.pwrite(value_fd(pin), b"1" if value else b"0", 0)
+        print(f"[DEBUG] Wrote value {value} to GPIO {pin}")
     except Exception as e:
         print(f"[ERROR] Failed to write value: {e}")
 
-def read_value(pin_path):
+def read_value(pin):
     try:
-        with open(os.path.join(pin_path, "value"), "r") as f:
-            val = f.read().strip()
-        return val
+        return os.pread(value_fd(pin), 1, 0)
     except Exception as e:
         print(f"[ERROR] Failed to read value: {e}")
-        return "0"
-
-def measure_distance():
-    trig_path = export_gpio(TRIG_GPIO)
-    echo_path = export_gpio(ECHO_GPIO)
+        return b"0"
 
-    if not trig_path or not echo_path:
-        return None
-
-    set_direction(trig_path, "out")
-    set_direction(echo_path, "in")
+def _busy_wait_ns(ns):
+    # time.sleep() can't do 10µs (timer slack); spin on the monotonic clock
+    end = time.monotonic_ns() + ns
+    while time.monotonic_ns() < end:
+        pass
 
+def measure_distance(trig, echo):
+    # Pins are exported and their directions set once in __main__
     print("[DEBUG] Ensuring trigger is low")
-    write_value(trig_path, 0)
+    write_value(trig, 0)
     time.sleep(0.05)
 
     print("[DEBUG] Sending 10µs trigger pulse")
-    write_value(trig_path, 1)
-    time.sleep(0.00001)
-    write_value(trig_path, 0)
+    write_value(trig, 1)
+    _busy_wait_ns(10_000)
+    write_value(trig, 0)
 
     print("[DEBUG] Waiting for Echo to go HIGH")
     timeout = time.time() + 0.2
-    while read_value(echo_path) == "0":
+    while read_value(echo) == b"0":
         if time.time() > timeout:
             print("[ERROR] Timeout waiting for Echo to go HIGH")
             return None
@@ -83,7 +81,7 @@ def measure_distance():
 
     print("[DEBUG] Waiting for Echo to go LOW")
     timeout = time.time() + 0.2
-    while read_value(echo_path) == "1":
+    while read_value(echo) == b"1":
         if time.time() > timeout:
             print("[ERROR] Timeout waiting for Echo to go LOW")
             return None
@@ -98,10 +96,17 @@ def measure_distance():
 
 # ✅ Main loop with cleanup
 if __name__ == "__main__":
+    trig_path = export_gpio(TRIG_GPIO)
+    echo_path = export_gpio(ECHO_GPIO)
+    if not trig_path or not echo_path:
+        raise SystemExit("[ERROR] Ultrasonic GPIOs unavailable")
+    set_direction(trig_path, "out")
+    set_direction(echo_path, "in")
+
     try:
         while True:
             print("\n[INFO] Starting ultrasonic measurement...")
-            distance = measure_distance()
+            distance = measure_distance(TRIG_GPIO, ECHO_GPIO)
             if distance is None:
                 print("[RESULT] ❌ No object detected (timeout).")
             else:
@@ -1,26 +1,84 @@
+import ctypes
+import fcntl
+import os
+import select
+import struct
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import Final
 import time
 
 import gpiod
-from gpiod.line import Direction, Value
+from gpiod.line import Clock, Direction, Edge, Value
 
 TRIG: Final = 10
 ECHO: Final = 37
 
+# Extra (trig, echo) sensors. Non-empty: __main__ pings them together with
+# TRIG/ECHO through UltrasonicArray instead of running the single-sensor loop.
+ARRAY_PINS: Final[tuple[tuple[int, int], ...]] = ()
 
+# Measurement core / priority. For a quiet core, boot with
+#   isolcpus=3 nohz_full=3 rcu_nocbs=3
+RT_CPU: Final = 3
+RT_PRIO: Final = 80
+MCL_CURRENT: Final = 1
+MCL_FUTURE: Final = 2
+
+# Per-step trace prints in __main__. Off by default: a print per step costs
+# more than the echo itself. Distances are printed in batches of REPORT_EVERY.
+DEBUG: Final = False
+REPORT_EVERY: Final = 32
+
+# HC-SR04 measurement cycle: at least 60 ms from one trigger to the next, or
+# a late echo from the previous ping can be read as the current one
+CYCLE_SEC: Final = 0.06
+
+# Below this, sleep() overshoots (timer slack / wakeup latency), so spin instead
+BUSY_WAIT_MAX_SEC: Final = 1e-3
+
+# linux/gpio.h: struct gpio_v2_line_values and its ioctls. Values are
+# read/written with these directly; libgpiod still sets up the line request.
+class _LineValues(ctypes.Structure):
+    _fields_ = [("bits", ctypes.c_uint64), ("mask", ctypes.c_uint64)]
+
+GPIO_V2_LINE_GET_VALUES_IOCTL: Final = 0xC010B40E   # _IOWR(0xB4, 0x0E, 16 bytes)
+GPIO_V2_LINE_SET_VALUES_IOCTL: Final = 0xC010B40F   # _IOWR(0xB4, 0x0F, 16 bytes)
+
+# linux/gpio.h struct gpio_v2_line_event, read straight off the request fd:
+# u64 timestamp_ns, u32 id, offset, seqno, line_seqno, padding[6] -> 48 bytes
+GPIO_V2_LINE_EVENT_RISING_EDGE: Final = 1
+GPIO_V2_LINE_EVENT_FALLING_EDGE: Final = 2
+EVENT_SIZE: Final = 48
+_unpack_event = struct.Struct("=QII").unpack_from   # timestamp_ns, id, offset
+
+# Edge events pulled per read; one ping queues two
+EV_BATCH: Final = 16
+_evbuf = bytearray(EVENT_SIZE * EV_BATCH)
+_evview = memoryview(_evbuf)
+
+# Edge event id that moves a line to the given level
+_EDGE_TO = {
+    Value.ACTIVE: GPIO_V2_LINE_EVENT_RISING_EDGE,
+    Value.INACTIVE: GPIO_V2_LINE_EVENT_FALLING_EDGE,
+}
+
+
+# GPIO controller base address for each bank of 32 lines
+_SL1680_BANK_ADDR: Final = ("f7e82400", "f7e80800", "f7e80c00")
+
+
+@lru_cache(maxsize=None)
 def get_address_info_sl1680(gpio_id: int) -> tuple[str, int]:
-    if not isinstance(gpio_id, int):
-        raise TypeError(f"GPIO ID must be an integer, not {type(gpio_id)}")
-    if 0 <= gpio_id < 32:
-        return "f7e82400", gpio_id
-    elif 32 <= gpio_id < 64:
-        return "f7e80800", gpio_id - 32
-    elif 64 <= gpio_id < 96:
-        return "f7e80c00", gpio_id - 64
+    bank, line = divmod(gpio_id, 32)
+    if 0 <= bank < len(_SL1680_BANK_ADDR):
+        return _SL1680_BANK_ADDR[bank], line
     raise ValueError(f"Invalid GPIO ID '{gpio_id}'")
 
 
+# Opening every /dev/gpio* chip is the expensive part; do it once per address
+@lru_cache(maxsize=None)
 def get_gpio_chip(address: str) -> str:
     devs: list[str] = [str(p) for p in Path("/dev").glob("gpio*")]
     for dev in devs:
@@ -37,75 +95,368 @@ def get_gpio_info(gpio_id: int) -> tuple[str, int]:
     return dev, line
 
 
+def make_realtime(core: int = RT_CPU, prio: int = RT_PRIO):
+    """
+    Pin to one core, run under SCHED_FIFO and lock memory, so the echo
+    timing isn't stretched by preemption, migration or page faults.
+    Needs root / CAP_SYS_NICE; otherwise logs and keeps the defaults.
+    """
+    try:
+        os.sched_setaffinity(0, {core % (os.cpu_count() or 1)})
+    except OSError as e:
+        print(f"[RT] Could not pin to CPU {core}: {e}")
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(prio))
+        print(f"[RT] SCHED_FIFO priority {prio}")
+    except OSError as e:
+        print(f"[RT] SCHED_FIFO unavailable ({e}), using default scheduling.")
+    try:
+        libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            print(f"[RT] mlockall failed: {os.strerror(ctypes.get_errno())}")
+    except OSError as e:
+        print(f"[RT] mlockall unavailable: {e}")
+
+
+# Userspace pulse timing uses CLOCK_MONOTONIC_RAW: unlike CLOCK_MONOTONIC it
+# isn't slewed by NTP while a pulse is being measured
+_clock_ns = time.clock_gettime_ns
+_RAW: Final = time.CLOCK_MONOTONIC_RAW
+
+
+def _busy_wait_ns(ns: int):
+    # time.sleep() can't do 10us; spin on the raw monotonic clock
+    end = _clock_ns(_RAW) + ns
+    while _clock_ns(_RAW) < end:
+        pass
+
+
+def _pace(deadline: float) -> float:
+    # Sleep until the absolute deadline (time.monotonic()) and return the next
+    # one; after an overrun, restart the grid from now instead of bursting
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+        return deadline + CYCLE_SEC
+    return time.monotonic() + CYCLE_SEC
+
+
+@lru_cache(maxsize=None)   # one shared LineSettings per (direction, edge)
+def _line_settings(direction: Direction, edge: Edge = Edge.NONE) -> gpiod.LineSettings:
+    # Edge timestamps are taken on CLOCK_MONOTONIC in the GPIO IRQ (the uAPI
+    # has no RAW option). Polled stamps are CLOCK_MONOTONIC_RAW, so a pulse
+    # width must come from two stamps of the same kind.
+    return gpiod.LineSettings(direction=direction, edge_detection=edge,
+                              event_clock=Clock.MONOTONIC)
+
+
+def _drain_edge_events(fd: int) -> list[tuple[int, int, int]]:
+    """
+    Read every queued edge event on a line-request fd as
+    (timestamp_ns, id, offset) tuples, parsed from the raw uAPI struct
+    into one reused buffer instead of building EdgeEvent objects.
+    """
+    # The fd is registered EPOLLET, which won't report events that are
+    # already queued again: read until the queue is empty. That loop ends on
+    # EAGAIN, so a blocking fd would hang it once the queue runs dry.
+    if os.get_blocking(fd):
+        raise ValueError(f"edge-event fd {fd} must be non-blocking")
+    events = []
+    try:
+        while True:
+            n = os.readv(fd, [_evview])
+            events.extend(_unpack_event(_evbuf, off) for off in range(0, n, EVENT_SIZE))
+            if n < len(_evbuf):
+                break
+    except BlockingIOError:
+        pass
+    return events
+
+
 class GPIO:
 
-    def __init__(self, chip: str, line: int):
+    def __init__(self, chip: str, line: int, direction: Direction = Direction.OUTPUT,
+                 edge: Edge = Edge.NONE, req: gpiod.LineRequest | None = None):
         self.chip = chip
         self.line = line
+        self.edge = edge
+        self._events = []   # edge events read but not yet consumed
+        # One line request for the life of the object: each read/write is a
+        # single get/set ioctl instead of a chip open + line request per call.
+        # A request passed in is shared with other lines and owned by the caller.
+        self._owns_req = req is None
+        if req is None:
+            req = gpiod.request_lines(chip, config={line: _line_settings(direction, edge)})
+        self.req = req
+        # The line's bit in the request's value bitmap is its index in the request
+        self._fd = req.fd
+        self._mask = 1 << req.offsets.index(line)
+        self._vals = _LineValues(0, self._mask)          # GET_VALUES scratch
+        self._high = _LineValues(self._mask, self._mask)  # prebuilt SET_VALUES args
+        self._low = _LineValues(0, self._mask)
+        # Edge lines: the request fd becomes readable when events are queued,
+        # so waits are an epoll_wait that can sit alongside other event sources.
+        # Edge-triggered + non-blocking: each wakeup drains everything queued
+        # in one pass, and a stale wakeup reads nothing instead of blocking.
+        self._epoll = None
+        if edge is not Edge.NONE:
+            os.set_blocking(req.fd, False)
+            self._epoll = select.epoll()
+            self._epoll.register(req.fd, select.EPOLLIN | select.EPOLLET)
+
+    def close(self):
+        if self._epoll is not None:
+            self._epoll.close()
+        if self._owns_req:
+            self.req.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def read(self) -> Value:
-        with gpiod.request_lines(self.chip, config={self.line: gpiod.LineSettings(direction=Direction.INPUT)}) as req:
-            value = req.get_value(self.line)
-            return value
+        fcntl.ioctl(self._fd, GPIO_V2_LINE_GET_VALUES_IOCTL, self._vals)
+        return Value.ACTIVE if self._vals.bits & self._mask else Value.INACTIVE
 
     def write(self, value: Value):
-        with gpiod.request_lines(self.chip, config={self.line: gpiod.LineSettings(direction=Direction.OUTPUT)}) as req:
-            req.set_value(self.line, value)
+        fcntl.ioctl(self._fd, GPIO_V2_LINE_SET_VALUES_IOCTL,
+                    self._high if value == Value.ACTIVE else self._low)
 
     def set_high(self):
-        self.write(Value.ACTIVE)
+        fcntl.ioctl(self._fd, GPIO_V2_LINE_SET_VALUES_IOCTL, self._high)
 
     def set_low(self):
-        self.write(Value.INACTIVE)
+        fcntl.ioctl(self._fd, GPIO_V2_LINE_SET_VALUES_IOCTL, self._low)
 
     def pulse_high(self, duration_sec: float):
-        with gpiod.request_lines(self.chip, config={self.line: gpiod.LineSettings(direction=Direction.OUTPUT)}) as req:
-            req.set_value(self.line, Value.ACTIVE)
+        ioctl, fd = fcntl.ioctl, self._fd
+        ioctl(fd, GPIO_V2_LINE_SET_VALUES_IOCTL, self._high)
+        if duration_sec < BUSY_WAIT_MAX_SEC:
+            _busy_wait_ns(int(duration_sec * 1e9))
+        else:
             time.sleep(duration_sec)
-            req.set_value(self.line, Value.INACTIVE)
+        ioctl(fd, GPIO_V2_LINE_SET_VALUES_IOCTL, self._low)
+
+    def drain_edges(self):
+        """Drop edge events left over from a previous (timed-out) cycle."""
+        if self._epoll is None:
+            return   # no edge detection: nothing is ever queued, and the fd blocks
+        self._events.clear()
+        _drain_edge_events(self._fd)
 
     def wait_for_value(self, target_value: Value, timeout: float) -> int | None:
-        deadline = time.monotonic_ns() + int(timeout * 1e9)
-        with gpiod.request_lines(self.chip, config={self.line: gpiod.LineSettings(direction=Direction.INPUT)}) as req:
-            while time.monotonic_ns() < deadline:
-                if req.get_value(self.line) == target_value:
-                    return time.monotonic_ns()
-        return None
+        if self.edge is not Edge.NONE:
+            return self._wait_for_edge(_EDGE_TO[target_value], timeout)
+        # Without edge events: stamp *before* each read, so the returned time
+        # excludes the ioctl that observed the change. Hot loop, so the clock,
+        # ioctl and its arguments are bound to locals once and the raw bit is
+        # compared without building a Value per sample.
+        # Waits for a *transition* (prev ^ cur), not a level: if the line is
+        # already at target on entry, that edge was missed and can't be timed,
+        # so the next (opposite) transition returns None instead of a bogus stamp.
+        clock, raw = _clock_ns, _RAW
+        ioctl = fcntl.ioctl
+        fd, vals, mask = self._fd, self._vals, self._mask
+        want = mask if target_value == Value.ACTIVE else 0
+        deadline = clock(raw) + int(timeout * 1e9)
+        ioctl(fd, GPIO_V2_LINE_GET_VALUES_IOCTL, vals)
+        prev = vals.bits & mask
+        while True:
+            now = clock(raw)
+            if now >= deadline:
+                return None
+            ioctl(fd, GPIO_V2_LINE_GET_VALUES_IOCTL, vals)
+            cur = vals.bits & mask
+            if cur ^ prev:
+                return now if cur == want else None
+
+    def _wait_for_edge(self, edge_id: int, timeout: float) -> int | None:
+        # Sleeps in epoll until an edge arrives; returns the event's
+        # kernel timestamp instead of polling get_value in Python
+        deadline = time.monotonic() + timeout
+        while True:
+            while self._events:
+                ts, ev_id, _ = self._events.pop(0)
+                if ev_id == edge_id:
+                    return ts
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._epoll.poll(remaining):
+                return None
+            # usually both edges of the echo; keep the rest for the next call
+            self._events = _drain_edge_events(self._fd)
+
+
+class UltrasonicArray:
+    """
+    Several HC-SR04s driven as one: a single line request per gpiochip
+    covering its TRIG and ECHO lines, every trigger fired by one SET_VALUES
+    ioctl per chip, and all echo edges collected through one epoll.
+    """
+
+    def __init__(self, pins: list[tuple[int, int]]):
+        # pins: (trig_id, echo_id) per sensor
+        placed = [get_gpio_info(t) + get_gpio_info(e) for t, e in pins]
+        config: dict[str, dict] = {}
+        for trig_chip, trig_line, echo_chip, echo_line in placed:
+            config.setdefault(trig_chip, {})[trig_line] = _line_settings(Direction.OUTPUT)
+            config.setdefault(echo_chip, {})[echo_line] = _line_settings(Direction.INPUT, Edge.BOTH)
+        self.reqs = {chip: gpiod.request_lines(chip, config=cfg) for chip, cfg in config.items()}
+        self.n = len(placed)
+
+        trig_mask: dict[str, int] = {}
+        self._echo: dict[int, dict[int, int]] = {}   # fd -> {echo offset: sensor index}
+        for i, (trig_chip, trig_line, echo_chip, echo_line) in enumerate(placed):
+            req = self.reqs[trig_chip]
+            trig_mask[trig_chip] = trig_mask.get(trig_chip, 0) | 1 << req.offsets.index(trig_line)
+            req = self.reqs[echo_chip]
+            self._echo.setdefault(req.fd, {})[echo_line] = i
+
+        # (fd, all-high, all-low) per chip that has triggers
+        self._trig = [(self.reqs[chip].fd, _LineValues(mask, mask), _LineValues(0, mask))
+                      for chip, mask in trig_mask.items()]
+
+        self._epoll = select.epoll()
+        for fd in self._echo:
+            os.set_blocking(fd, False)
+            self._epoll.register(fd, select.EPOLLIN | select.EPOLLET)
+
+    def ping_all(self, timeout: float = 0.2) -> list[float | None]:
+        """
+        Fire every TRIG together and return each sensor's distance in cm
+        (None if its echo didn't complete within timeout).
+        """
+        for fd in self._echo:
+            _drain_edge_events(fd)   # stale edges from a timed-out ping
+
+        ioctl = fcntl.ioctl
+        for fd, high, _ in self._trig:
+            ioctl(fd, GPIO_V2_LINE_SET_VALUES_IOCTL, high)
+        _busy_wait_ns(10_000)
+        for fd, _, low in self._trig:
+            ioctl(fd, GPIO_V2_LINE_SET_VALUES_IOCTL, low)
+
+        rising = _EDGE_TO[Value.ACTIVE]
+        start: list[int | None] = [None] * self.n
+        dist: list[float | None] = [None] * self.n
+        pending = self.n
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for fd, _ in self._epoll.poll(remaining):
+                sensor_of = self._echo[fd]
+                for ts, ev_id, offset in _drain_edge_events(fd):
+                    i = sensor_of.get(offset)
+                    if i is None or dist[i] is not None:
+                        continue
+                    if ev_id == rising:
+                        start[i] = ts
+                    elif start[i] is not None:
+                        # 34300 cm/s round trip -> 17150 cm/s one way
+                        dist[i] = (ts - start[i]) * 17150e-9
+                        pending -= 1
+        return dist
+
+    def close(self):
+        self._epoll.close()
+        for req in self.reqs.values():
+            req.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextmanager
+def ultrasonic_lines(trig_id: int, echo_id: int):
+    """
+    Yield (trig, echo) GPIOs. When both pins sit on the same gpiochip they
+    share one line request: one fd for the trigger writes and echo events.
+    """
+    trig_chip, trig_line = get_gpio_info(trig_id)
+    echo_chip, echo_line = get_gpio_info(echo_id)
+    if trig_chip == echo_chip:
+        config = {
+            trig_line: _line_settings(Direction.OUTPUT),
+            echo_line: _line_settings(Direction.INPUT, Edge.BOTH),
+        }
+        # GPIOs close first (echo's epoll), then the shared request is released
+        with gpiod.request_lines(trig_chip, config=config) as req, \
+             GPIO(trig_chip, trig_line, req=req) as trig, \
+             GPIO(echo_chip, echo_line, edge=Edge.BOTH, req=req) as echo:
+            yield trig, echo
+    else:
+        with GPIO(trig_chip, trig_line, Direction.OUTPUT) as trig, \
+             GPIO(echo_chip, echo_line, Direction.INPUT, Edge.BOTH) as echo:
+            yield trig, echo
+
+
+def _array_main():
+    batch: list[str] = []
+    with UltrasonicArray([(TRIG, ECHO), *ARRAY_PINS]) as array:
+        next_cycle = time.monotonic()
+        while True:
+            try:
+                next_cycle = _pace(next_cycle)
+                dist = array.ping_all()
+                batch.append(" ".join("--" if d is None else f"{d:.1f}" for d in dist))
+                if len(batch) >= REPORT_EVERY:
+                    print("\n".join(batch))
+                    batch.clear()
+
+            except KeyboardInterrupt:
+                print("Exiting ...")
+                break
 
 
 if __name__ == "__main__":
-    trig_chip, trig_line = get_gpio_info(TRIG)
-    echo_chip, echo_line = get_gpio_info(ECHO)
-    trig = GPIO(trig_chip, trig_line)
-    echo = GPIO(echo_chip, echo_line)
-
-    while True:
-        try:
-            print("[DEBUG] Ensuring trigger is low")
-            trig.set_low()
-
-            print("[DEBUG] Sending 10µs trigger pulse")
-            trig.pulse_high(10e-6)
-
-            print("[DEBUG] Waiting for Echo to go HIGH")
-            start = echo.wait_for_value(Value.ACTIVE, timeout=0.2)
-            if start is None:
-                print("[ERROR] Timeout waiting for Echo to go HIGH")
-            else:
-                print(f"[DEBUG] Echo went HIGH at {start} ns")
-
-            print("[DEBUG] Waiting for Echo to go LOW")
-            end = echo.wait_for_value(Value.INACTIVE, timeout=0.2)
-            if end is None:
-                print("[ERROR] Timeout waiting for Echo to go LOW")
-            else:
-                print(f"[DEBUG] Echo went LOW at {end} ns")
-
-            duration_sec = (end - start) / 1e9
-            print(f"[DEBUG] Pulse duration: {duration_sec:.6f} seconds")
-
-            distance_cm = (duration_sec * 34300) / 2
-            print(distance_cm)
-
-        except KeyboardInterrupt:
-            print(f"Exiting ...")
\ No newline at end of file
+    make_realtime()
+    if ARRAY_PINS:
+        _array_main()
+    else:
+        batch: list[float] = []
+        with ultrasonic_lines(TRIG, ECHO) as (trig, echo):
+            next_cycle = time.monotonic()
+            while True:
+                try:
+                    # at the top so the timeout `continue`s are paced too
+                    next_cycle = _pace(next_cycle)
+
+                    if DEBUG: print("[DEBUG] Ensuring trigger is low")
+                    trig.set_low()
+                    echo.drain_edges()
+
+                    if DEBUG: print("[DEBUG] Sending 10µs trigger pulse")
+                    trig.pulse_high(10e-6)
+
+                    if DEBUG: print("[DEBUG] Waiting for Echo to go HIGH")
+                    start = echo.wait_for_value(Value.ACTIVE, timeout=0.2)
+                    if start is None:
+                        print("[ERROR] Timeout waiting for Echo to go HIGH")
+                        continue   # no echo: don't spend a second timeout on LOW
+                    if DEBUG: print(f"[DEBUG] Echo went HIGH at {start} ns (kernel timestamp)")
+
+                    if DEBUG: print("[DEBUG] Waiting for Echo to go LOW")
+                    end = echo.wait_for_value(Value.INACTIVE, timeout=0.2)
+                    if end is None:
+                        print("[ERROR] Timeout waiting for Echo to go LOW")
+                        continue
+                    if DEBUG: print(f"[DEBUG] Echo went LOW at {end} ns (kernel timestamp)")
+
+                    duration_sec = (end - start) / 1e9
+                    if DEBUG: print(f"[DEBUG] Pulse duration: {duration_sec:.6f} seconds")
+
+                    distance_cm = (duration_sec * 34300) / 2
+                    batch.append(distance_cm)
+                    if len(batch) >= REPORT_EVERY:
+                        print(" ".join(f"{d:.1f}" for d in batch))
+                        batch.clear()
+
+                except KeyboardInterrupt:
+                    print(f"Exiting ...")
+                    break